@@ -0,0 +1,392 @@
+#!/usr/bin/env python
+"""
+Requêtes ad hoc sur un snapshot d'audit (.nasnap), via `snapshot.py query`.
+
+Index persistants, construits une fois à côté du snapshot (<snapshot>.idx/, tableaux numpy
+projetés en mémoire, reconstruits si le snapshot change) :
+  - ext_id / ext.json      : extension (minuscules) de chaque ligne ;
+  - parent_id / dirs.nul   : dossier parent de chaque ligne ;
+  - group_id / group_count : groupe de doublons (empreinte BLAKE3 complète), -1 sans hash
+                             ou pour un chemin déjà vu (racines de scan imbriquées, NFC/NFD) ;
+  - keeper                 : fichier conservé par groupe, choisi par les règles par défaut
+                             de select_keepers.py (même choix que la liste qu'il produit) ;
+  - by_size / by_mtime     : ordres de tri (taille décroissante, date croissante).
+Taille et date sont lues directement dans les colonnes du snapshot ; un préfixe de chemin
+devient une plage d'indices (chemins triés), sans index supplémentaire.
+"""
+import csv
+import json
+import os
+import sys
+import time
+import unicodedata
+from datetime import datetime
+
+import numpy as np
+
+from snapshot import DIGEST_SIZE, FLAG_DIR, FLAG_HASH, FLAG_MTIME, FLAG_SIZE, MTIME_FORMAT, Snapshot
+
+INDEX_VERSION = 2
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+AGE_UNITS = {"d": 86400, "w": 7 * 86400, "m": 30.44 * 86400, "y": 365.25 * 86400}
+GROUP_SORTS = ("bytes", "files", "reclaimable")
+ROW_SORTS = ("size", "mtime", "path")
+
+
+def index_dir(snapshot_path: str) -> str:
+    return snapshot_path + ".idx"
+
+
+def _snapshot_stamp(snapshot_path: str) -> dict:
+    st = os.stat(snapshot_path)
+    return {"version": INDEX_VERSION, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _columns(snap: Snapshot):
+    sizes = np.asarray(snap.sizes)
+    mtimes = np.asarray(snap.mtimes)
+    flags = np.asarray(snap.flags)
+    words = np.frombuffer(snap.digests, dtype="<u8").reshape(-1, DIGEST_SIZE // 8)
+    return sizes, mtimes, flags, words
+
+
+def build_indexes(snapshot_path: str) -> str:
+    """Construit les index d'un snapshot ; renvoie le dossier d'index."""
+    out = index_dir(snapshot_path)
+    os.makedirs(out, exist_ok=True)
+    with Snapshot(snapshot_path) as snap:
+        n = len(snap)
+        sizes, mtimes, flags, words = _columns(snap)
+
+        # Un passage sur les chemins (décodage bloc par bloc) : extension, parent, chemins répétés.
+        # Chemins triés : une répétition exacte est adjacente ; une graphie NFD ne peut égaler
+        # que la forme NFC d'un chemin non ASCII (seuls ceux-ci passent par un dictionnaire).
+        ext_ids, dir_ids, seen_nfc = {"": 0}, {}, set()
+        ext_id = np.empty(n, dtype=np.int32)
+        parent_id = np.empty(n, dtype=np.int32)
+        repeated = np.zeros(n, dtype=bool)
+        i, prev = 0, None
+        for b in range(snap.n_blocks):
+            for path in snap.block_paths(b):
+                parent, _, name = path.rpartition("/")
+                dot = name.rfind(".")
+                ext = name[dot + 1:].lower() if dot > 0 else ""
+                ext_id[i] = ext_ids.setdefault(ext, len(ext_ids))
+                parent_id[i] = dir_ids.setdefault(parent or "/", len(dir_ids))
+                if path == prev:
+                    repeated[i] = True
+                elif not path.isascii():
+                    nfc = unicodedata.normalize("NFC", path)
+                    repeated[i] = nfc in seen_nfc
+                    seen_nfc.add(nfc)
+                prev = path
+                i += 1
+        del seen_nfc
+
+        # Groupes de doublons : tri lexicographique des 4 mots de 64 bits (empreinte complète)
+        group_id = np.full(n, -1, dtype=np.int32)
+        hashed = np.flatnonzero((flags & FLAG_HASH).astype(bool) & ~(flags & FLAG_DIR).astype(bool) & ~repeated)
+        group_count = np.zeros(0, dtype=np.int32)
+        if len(hashed):
+            w = words[hashed]
+            order = np.lexsort(w.T[::-1])
+            sw = w[order]
+            new_group = np.ones(len(order), dtype=bool)
+            new_group[1:] = (sw[1:] != sw[:-1]).any(axis=1)
+            group_id[hashed[order]] = np.cumsum(new_group) - 1
+            group_count = np.bincount(group_id[hashed]).astype(np.int32)
+
+        # Fichier conservé par groupe : mêmes règles que select_keepers.py (défaut), pour que
+        # --extra-copies et paths_to_delete.json désignent les mêmes copies
+        keeper = np.zeros(n, dtype=bool)
+        dup_rows = hashed[group_count[group_id[hashed]] > 1] if len(hashed) else hashed
+        keeper[dup_rows] = True
+        if len(dup_rows):
+            keeper[_extra_copies(snap, dup_rows, group_id, mtimes, flags)] = False
+
+        index_type = np.int32 if n < 2 ** 31 else np.int64
+        by_size = np.argsort(-sizes, kind="stable").astype(index_type)
+        by_mtime = np.argsort(mtimes, kind="stable").astype(index_type)
+        del sizes, mtimes, flags, words   # vues sur le mmap : à libérer avant sa fermeture
+
+    for name, arr in (("ext_id", ext_id), ("parent_id", parent_id), ("group_id", group_id),
+                      ("group_count", group_count), ("keeper", keeper),
+                      ("by_size", by_size), ("by_mtime", by_mtime)):
+        np.save(os.path.join(out, name + ".npy"), arr)
+    with open(os.path.join(out, "ext.json"), "w", encoding="utf-8") as f:
+        json.dump(list(ext_ids), f, ensure_ascii=False)
+    with open(os.path.join(out, "dirs.nul"), "wb") as f:
+        f.write("".join(d + "\0" for d in dir_ids).encode("utf-8"))
+    with open(os.path.join(out, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(_snapshot_stamp(snapshot_path), f)
+    return out
+
+
+def _extra_copies(snap: Snapshot, rows, group_id, mtimes, flags):
+    """Lignes des copies en trop, selon select_deletions et DEFAULT_RULES."""
+    import pandas as pd
+    from select_keepers import DEFAULT_RULES, select_deletions
+
+    rows = rows[np.argsort(np.asarray(snap.order)[rows], kind="stable")]   # ordre du CSV (égalités)
+    has_mtime = (flags[rows] & FLAG_MTIME).astype(bool)
+    df = pd.DataFrame({
+        "path": paths_for(snap, rows),
+        "size_bytes": 0,
+        "mtime": pd.to_datetime(np.where(has_mtime, mtimes[rows], 0), unit="s").where(has_mtime),
+        "hash": "",
+        "group": group_id[rows],
+    })
+    return rows[select_deletions(df, DEFAULT_RULES.split(",")).index.to_numpy()]
+
+
+def load_indexes(snapshot_path: str) -> dict:
+    """Charge les index (projetés en mémoire), en les reconstruisant s'ils sont absents ou périmés."""
+    out = index_dir(snapshot_path)
+    meta_path = os.path.join(out, "meta.json")
+    fresh = False
+    if os.path.exists(meta_path):
+        with open(meta_path, encoding="utf-8") as f:
+            fresh = json.load(f) == _snapshot_stamp(snapshot_path)
+    if not fresh:
+        print(f"Construction des index : {out}", file=sys.stderr)
+        build_indexes(snapshot_path)
+    idx = {
+        name: np.load(os.path.join(out, name + ".npy"), mmap_mode="r")
+        for name in ("ext_id", "parent_id", "group_id", "group_count", "keeper", "by_size", "by_mtime")
+    }
+    with open(os.path.join(out, "ext.json"), encoding="utf-8") as f:
+        idx["ext_names"] = json.load(f)
+    return idx
+
+
+def load_dir_names(snapshot_path: str):
+    with open(os.path.join(index_dir(snapshot_path), "dirs.nul"), "rb") as f:
+        return f.read().decode("utf-8").split("\0")[:-1]
+
+
+def parse_size(value: str) -> int:
+    """« 1G », « 500M », « 2048 » -> octets (unités binaires)."""
+    v = value.strip().upper().removesuffix("B").removesuffix("I")
+    unit = v[-1] if v and v[-1] in SIZE_UNITS else ""
+    try:
+        return int(float(v[:-1] if unit else v) * SIZE_UNITS[unit])
+    except ValueError:
+        raise ValueError(f"Taille invalide : {value!r} (ex. 1G, 500M, 2048)") from None
+
+
+def parse_age(value: str, now: float) -> int:
+    """« 5y », « 18m », « 30d », « 2w » (avant maintenant) ou date « AAAA-MM-JJ » -> epoch UTC."""
+    v = value.strip()
+    if v and v[-1].lower() in AGE_UNITS and v[:-1].replace(".", "", 1).isdigit():
+        return int(now - float(v[:-1]) * AGE_UNITS[v[-1].lower()])
+    try:
+        return int((datetime.strptime(v, "%Y-%m-%d") - datetime(1970, 1, 1)).total_seconds())
+    except ValueError:
+        raise ValueError(f"Âge ou date invalide : {value!r} (ex. 5y, 30d, 2020-01-31)") from None
+
+
+def parse_query_args(args) -> dict:
+    """Valide les valeurs de la ligne de commande avant toute ouverture du snapshot."""
+    now = time.time()
+    if args.top < 0:
+        raise ValueError("--top doit être positif ou nul.")
+    if args.group_by:
+        sort = args.sort or "bytes"
+        if sort not in GROUP_SORTS or args.format != "csv":
+            raise ValueError(f"Avec --group-by : --format csv et --sort parmi {', '.join(GROUP_SORTS)}.")
+    else:
+        sort = args.sort or "size"
+        if sort not in ROW_SORTS:
+            raise ValueError(f"--sort parmi {', '.join(ROW_SORTS)}.")
+    return {
+        "sort": sort,
+        "ext": {e.strip().lstrip(".").lower() for e in ",".join(args.ext).split(",") if e.strip()},
+        "min_size": None if args.min_size is None else parse_size(args.min_size),
+        "max_size": None if args.max_size is None else parse_size(args.max_size),
+        "older_than": None if args.older_than is None else parse_age(args.older_than, now),
+        "newer_than": None if args.newer_than is None else parse_age(args.newer_than, now),
+    }
+
+
+def prefix_range(snap: Snapshot, prefix: str):
+    """Plage [lo, hi) des chemins sous `prefix` (chemins triés : '/' < '0')."""
+    p = prefix.rstrip("/")
+    return snap.lower_bound(p + "/"), snap.lower_bound(p + "0")
+
+
+def paths_for(snap: Snapshot, rows):
+    """Chemins des lignes demandées, dans leur ordre : lignes parcourues par indice croissant,
+    chaque bloc concerné n'est décodé qu'une fois."""
+    rows = np.asarray(rows, dtype=np.int64)
+    out = [None] * len(rows)
+    b_cur, block = -1, None
+    for pos in np.argsort(rows, kind="stable"):
+        i = int(rows[pos])
+        b = i // snap.block_size
+        if b != b_cur:
+            b_cur, block = b, snap.block_paths(b)
+        out[pos] = block[i % snap.block_size]
+    return out
+
+
+def select_rows(snap: Snapshot, idx: dict, args, values: dict):
+    """Masque des lignes retenues par les filtres (valeurs déjà validées par parse_query_args)."""
+    sizes, mtimes, flags, words = _columns(snap)
+    try:
+        n = len(snap)
+        is_dir = (flags & FLAG_DIR).astype(bool)
+        mask = {"file": ~is_dir, "directory": is_dir, "all": np.ones(n, dtype=bool)}[args.type]
+
+        if args.under:
+            in_range = np.zeros(n, dtype=bool)
+            for prefix in args.under:
+                lo, hi = prefix_range(snap, prefix)
+                in_range[lo:hi] = True
+            mask &= in_range
+        if values["ext"]:
+            ids = [i for i, e in enumerate(idx["ext_names"]) if e in values["ext"]]
+            mask &= np.isin(idx["ext_id"], ids)
+
+        has_size = (flags & FLAG_SIZE).astype(bool)
+        if values["min_size"] is not None:
+            mask &= has_size & (sizes >= values["min_size"])
+        if values["max_size"] is not None:
+            mask &= has_size & (sizes <= values["max_size"])
+
+        has_mtime = (flags & FLAG_MTIME).astype(bool)
+        if values["older_than"] is not None:
+            mask &= has_mtime & (mtimes < values["older_than"])
+        if values["newer_than"] is not None:
+            mask &= has_mtime & (mtimes >= values["newer_than"])
+    finally:
+        del sizes, mtimes, flags, words   # vues sur le mmap : à libérer avant sa fermeture
+
+    if args.dup_only or args.extra_copies:
+        group_id = idx["group_id"]
+        counts = np.asarray(idx["group_count"])
+        is_dup = group_id >= 0
+        is_dup[is_dup] = counts[group_id[is_dup]] > 1
+        mask &= is_dup
+        if args.extra_copies:
+            mask &= ~np.asarray(idx["keeper"])
+    return mask
+
+
+def query_rows(snap: Snapshot, idx: dict, mask: np.ndarray, sort: str, top: int):
+    """Indices retenus, triés (taille décroissante, date croissante ou chemin), limités à top."""
+    if sort == "size":
+        order = np.asarray(idx["by_size"])
+        rows = order[mask[order]]
+    elif sort == "mtime":
+        order = np.asarray(idx["by_mtime"])
+        rows = order[mask[order]]
+    else:
+        rows = np.flatnonzero(mask)
+    return rows[:top] if top else rows
+
+
+def query_groups(snap: Snapshot, idx: dict, mask: np.ndarray, group_by: str, sort: str, top: int):
+    """Agrégats par extension, dossier ou groupe de doublons : [(clé, fichiers, octets, doublons, récupérable)]."""
+    key_array = {"ext": idx["ext_id"], "dir": idx["parent_id"], "hash": idx["group_id"]}[group_by]
+    keys = np.asarray(key_array)
+    sel = mask & (keys >= 0)
+    rows = np.flatnonzero(sel)
+    k = keys[rows]
+    sizes, mtimes, flags, words = _columns(snap)
+    try:
+        size = np.where((flags[rows] & FLAG_SIZE).astype(bool), sizes[rows], 0).astype(np.float64)
+        digests = words[rows] if group_by == "hash" else None   # copie (indexation par tableau)
+    finally:
+        del sizes, mtimes, flags, words   # vues sur le mmap : à libérer avant sa fermeture
+
+    group_id = np.asarray(idx["group_id"])[rows]
+    counts = np.asarray(idx["group_count"])
+    dup = group_id >= 0
+    dup[dup] = counts[group_id[dup]] > 1
+    extra = dup & ~np.asarray(idx["keeper"])[rows]
+
+    n_keys = int(k.max()) + 1 if len(k) else 0
+    files = np.bincount(k, minlength=n_keys)
+    total = np.bincount(k, weights=size, minlength=n_keys)
+    dup_files = np.bincount(k, weights=dup, minlength=n_keys).astype(np.int64)
+    reclaimable = np.bincount(k, weights=size * extra, minlength=n_keys)
+
+    metric = {"bytes": total, "files": files, "reclaimable": reclaimable}[sort]
+    present = np.flatnonzero(files)
+    order = present[np.argsort(-metric[present], kind="stable")]
+    if top:
+        order = order[:top]
+
+    if group_by == "ext":
+        labels = [idx["ext_names"][i] or "(sans extension)" for i in order]
+    elif group_by == "dir":
+        names = load_dir_names(snap.path)
+        labels = [names[i] for i in order]
+    else:
+        # Empreinte d'un représentant de chaque groupe
+        first = np.full(n_keys, -1, dtype=np.int64)
+        first[k[::-1]] = np.arange(len(rows))[::-1]
+        labels = [digests[first[i]].astype("<u8").tobytes().hex() for i in order]
+    return [(label, int(files[i]), int(total[i]), int(dup_files[i]), int(reclaimable[i]))
+            for label, i in zip(labels, order)]
+
+
+def write_rows(snap: Snapshot, rows, fmt: str, out):
+    if fmt == "json":
+        json.dump(paths_for(snap, rows), out, ensure_ascii=False, indent=2)
+        out.write("\n")
+        return
+    out.write("path,type,size_bytes,mtime,hash\n")
+    for i, path in zip(rows, paths_for(snap, rows)):
+        _, typ, size, mtime, h = snap.record(int(i), path)
+        p_esc = path.replace('"', '""')
+        mtime_s = "" if mtime is None else time.strftime(MTIME_FORMAT, time.gmtime(mtime))
+        out.write(f'"{p_esc}",{typ},{"" if size is None else size},"{mtime_s}",{h or ""}\n')
+
+
+def add_query_arguments(p):
+    p.add_argument("snapshot", help="Snapshot d'audit (.nasnap)")
+    p.add_argument("--under", action="append", default=[], help="Restreindre à ce dossier (répétable)")
+    p.add_argument("--ext", action="append", default=[], help="Extensions, ex. 'mov,mp4' (répétable)")
+    p.add_argument("--min-size", default=None, help="Taille minimale, ex. 1G, 500M")
+    p.add_argument("--max-size", default=None, help="Taille maximale")
+    p.add_argument("--older-than", default=None, help="Modifié avant : 5y, 18m, 30d, 2w ou AAAA-MM-JJ")
+    p.add_argument("--newer-than", default=None, help="Modifié depuis : 5y, 18m, 30d, 2w ou AAAA-MM-JJ")
+    p.add_argument("--type", choices=["file", "directory", "all"], default="file", help="Type de lignes (défaut : file)")
+    p.add_argument("--dup-only", action="store_true", help="Seulement les fichiers ayant au moins un doublon")
+    p.add_argument("--extra-copies", action="store_true",
+                   help="Seulement les copies en trop (le fichier conservé de chaque groupe est exclu)")
+    p.add_argument("--group-by", choices=["ext", "dir", "hash"], default=None, help="Agréger par clé")
+    p.add_argument("--sort", default=None,
+                   help=f"Tri : lignes {'/'.join(ROW_SORTS)} (défaut size), groupes {'/'.join(GROUP_SORTS)} (défaut bytes)")
+    p.add_argument("--top", type=int, default=0, help="Nombre maximal de résultats (0 = tous)")
+    p.add_argument("--format", choices=["csv", "json"], default="csv",
+                   help="csv, ou json = liste de chemins (format paths_to_delete.json)")
+    p.add_argument("--output", default=None, help="Fichier de sortie (défaut : sortie standard)")
+
+
+def run_query(args):
+    start = time.perf_counter()
+    values = parse_query_args(args)
+    idx = load_indexes(args.snapshot)
+    with Snapshot(args.snapshot) as snap:
+        mask = select_rows(snap, idx, args, values)
+        out = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+        try:
+            if args.group_by:
+                groups = query_groups(snap, idx, mask, args.group_by, values["sort"], args.top)
+                writer = csv.writer(out)
+                writer.writerow([args.group_by, "files", "bytes", "dup_files", "reclaimable_bytes"])
+                writer.writerows(groups)
+                count = len(groups)
+            else:
+                rows = query_rows(snap, idx, mask, values["sort"], args.top)
+                write_rows(snap, rows, args.format, out)
+                count = len(rows)
+        finally:
+            if args.output:
+                out.close()
+    elapsed = time.perf_counter() - start
+    print(f"{count} résultats ({int(mask.sum())} lignes filtrées) en {elapsed:.2f} s", file=sys.stderr)
+    if args.output:
+        print(f"Résultats sauvegardés : {args.output}", file=sys.stderr)
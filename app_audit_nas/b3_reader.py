@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Lecteur de fichiers pour le hashing BLAKE3 sur montages réseau (SMB/NFS).
+
+- lecture séquentielle par gros blocs (readinto) dans un tampon préalloué et réutilisé
+  (bytearray + memoryview : aucune copie par bloc) ;
+- posix_fadvise(SEQUENTIAL) à l'ouverture et DONTNEED sur chaque bloc lu : le cache de pages
+  n'est pas pollué par des téraoctets lus une seule fois (F_NOCACHE sous macOS) ;
+- mmap uniquement sur système de fichiers local (jamais sur SMB/NFS) ;
+- moteur : module `blake3` s'il est installé, sinon les blocs sont envoyés à `b3sum` sur stdin.
+
+Sortie compatible b3sum (« <hash>  <chemin> »), utilisable comme HASHCMD par hashes_scans.sh.
+Avec --stats, chaque fichier ajoute une ligne au journal ; --report en fait la synthèse
+(débit par classe de taille).
+"""
+import argparse
+import os
+import re
+import shlex
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from functools import lru_cache
+
+DEFAULT_BLOCK_SIZE = 8 * 1024 * 1024
+NETWORK_FS = {
+    "nfs", "nfs4", "cifs", "smb3", "smbfs", "afpfs", "webdav", "davfs",
+    "fuse.sshfs", "fuse.rclone", "9p", "ceph", "glusterfs", "lustre",
+}
+SIZE_CLASSES = [
+    (1 << 20, "< 1 MB"),
+    (16 << 20, "1-16 MB"),
+    (256 << 20, "16-256 MB"),
+    (4 << 30, "256 MB-4 GB"),
+    (float("inf"), ">= 4 GB"),
+]
+
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+MOUNT_ESCAPE = re.compile(rb"\\([0-7]{3})")
+
+
+def parse_proc_mounts(data: bytes):
+    """
+    [(point de montage, type)] depuis /proc/self/mounts (ou mountinfo).
+    Seuls les échappements octaux (\\040 = espace…) sont décodés, sur les octets : les
+    noms accentués (UTF-8) restent intacts.
+    """
+    mounts = []
+    for line in data.splitlines():
+        parts = line.split()
+        if b" - " in line:   # format mountinfo : « … point … - type source options »
+            left, right = line.split(b" - ", 1)
+            fields, after = left.split(), right.split()
+            if len(fields) < 5 or not after:
+                continue
+            raw_mp, raw_type = fields[4], after[0]
+        elif len(parts) >= 3:
+            raw_mp, raw_type = parts[1], parts[2]
+        else:
+            continue
+        mp = MOUNT_ESCAPE.sub(lambda m: bytes([int(m[1], 8)]), raw_mp)
+        mounts.append((mp.decode("utf-8", "surrogateescape"), raw_type.decode("ascii", "replace")))
+    return mounts
+
+
+@lru_cache(maxsize=1)
+def _mount_table():
+    """[(point de montage, type)] trié du plus long au plus court."""
+    mounts = []
+    if os.path.exists("/proc/self/mounts"):
+        with open("/proc/self/mounts", "rb") as f:
+            mounts = parse_proc_mounts(f.read())
+    else:
+        # macOS / BSD : « //user@nas/share on /Volumes/NAS (smbfs, nodev, …) »
+        try:
+            out = subprocess.run(["mount"], capture_output=True, text=True, check=True).stdout
+        except (OSError, subprocess.CalledProcessError):
+            out = ""
+        for line in out.splitlines():
+            if " on " in line and " (" in line:
+                mp, rest = line.split(" on ", 1)[1].rsplit(" (", 1)
+                mounts.append((mp, rest.split(",", 1)[0].strip(") ")))
+    return sorted(mounts, key=lambda m: len(m[0]), reverse=True)
+
+
+def is_local_filesystem(path: str, mounts=None) -> bool:
+    """Faux pour un montage réseau, et aussi quand aucun point de montage ne correspond (prudence)."""
+    real = os.path.realpath(path)
+    for mp, fstype in (_mount_table() if mounts is None else mounts):
+        if real == mp or real.startswith(mp.rstrip("/") + "/"):
+            return fstype.lower() not in NETWORK_FS
+    return False
+
+
+def _advise(fd: int, offset: int, length: int, advice_name: str):
+    advice = getattr(os, advice_name, None)
+    if advice is not None and hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(fd, offset, length, advice)
+        except OSError:
+            pass
+
+
+class BlockReader:
+    """
+    Lecture séquentielle par blocs dans un tampon unique, réutilisé d'un fichier à l'autre.
+    fs : couche d'accès (fsio.py) ; None = accès direct.
+    """
+
+    def __init__(self, block_size: int = DEFAULT_BLOCK_SIZE, fs=None):
+        self.buffer = bytearray(block_size)
+        self.view = memoryview(self.buffer)
+        self.fs = fs
+
+    def iter_blocks(self, path: str):
+        """Renvoie des memoryview sur le tampon : à consommer avant le bloc suivant."""
+        f = open(path, "rb", buffering=0) if self.fs is None else self.fs.open(path, "rb", buffering=0)
+        with f:
+            fd = f.fileno()
+            _advise(fd, 0, 0, "POSIX_FADV_SEQUENTIAL")
+            if fcntl is not None and hasattr(fcntl, "F_NOCACHE"):
+                try:
+                    fcntl.fcntl(fd, fcntl.F_NOCACHE, 1)
+                except OSError:
+                    pass
+            offset = 0
+            while True:
+                n = f.readinto(self.view)
+                if not n:
+                    break
+                yield self.view[:n]
+                _advise(fd, offset, n, "POSIX_FADV_DONTNEED")
+                offset += n
+
+
+def _b3sum_cmd(use_mmap: bool):
+    flags = shlex.split(os.environ.get("B3FLAGS", ""))
+    if use_mmap:
+        flags = [f for f in flags if f != "--no-mmap"]
+    return ["b3sum", *flags]
+
+
+def hash_file(path: str, reader: BlockReader, mmap_mode: str = "auto"):
+    """Hash BLAKE3 d'un fichier ; renvoie (hash hexadécimal, octets lus, mode utilisé)."""
+    use_mmap = reader.fs is None and (
+        mmap_mode == "always" or (mmap_mode == "auto" and is_local_filesystem(path))
+    )
+    size = (os.stat(path) if reader.fs is None else reader.fs.stat(path)).st_size
+
+    if use_mmap and size:
+        if blake3 is not None:
+            return blake3.blake3(max_threads=1).update_mmap(path).hexdigest(), size, "mmap"
+        out = subprocess.run([*_b3sum_cmd(True), "--", path], capture_output=True, check=True).stdout
+        return out.split(b" ", 1)[0].decode("ascii"), size, "mmap"
+
+    total = 0
+    if blake3 is not None:
+        hasher = blake3.blake3()
+        for block in reader.iter_blocks(path):
+            hasher.update(block)
+            total += len(block)
+        return hasher.hexdigest(), total, "read"
+
+    proc = subprocess.Popen([*_b3sum_cmd(False), "-"], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    try:
+        for block in reader.iter_blocks(path):
+            proc.stdin.write(block)
+            total += len(block)
+    finally:
+        proc.stdin.close()
+    out = proc.stdout.read()
+    if proc.wait() != 0:
+        raise OSError(f"b3sum a échoué ({proc.returncode})")
+    return out.split(b" ", 1)[0].decode("ascii"), total, "read"
+
+
+def size_class(size: int) -> str:
+    for limit, label in SIZE_CLASSES:
+        if size < limit:
+            return label
+    return SIZE_CLASSES[-1][1]
+
+
+def report(stats_path: str):
+    """Débit moyen par classe de taille à partir du journal --stats."""
+    agg = defaultdict(lambda: [0, 0, 0.0])   # classe -> [fichiers, octets, secondes]
+    with open(stats_path, encoding="utf-8") as f:
+        for line in f:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) < 4:
+                continue
+            cls, nbytes, seconds = parts[0], int(parts[1]), float(parts[2])
+            agg[cls][0] += 1
+            agg[cls][1] += nbytes
+            agg[cls][2] += seconds
+    print(f"{'Classe':<14}{'Fichiers':>10}{'Volume (MB)':>14}{'Débit (MB/s)':>14}")
+    for _, label in SIZE_CLASSES:
+        if label not in agg:
+            continue
+        n, nbytes, seconds = agg[label]
+        mb = nbytes / (1024 * 1024)
+        print(f"{label:<14}{n:>10}{mb:>14.1f}{(mb / seconds if seconds else 0):>14.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Hash BLAKE3 par gros blocs (readinto + fadvise), sortie compatible b3sum."
+    )
+    parser.add_argument("files", nargs="*", help="Fichiers à hasher")
+    parser.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE,
+                        help="Taille des blocs de lecture en octets (défaut : 8 MiB)")
+    parser.add_argument("--mmap", choices=["auto", "always", "never"], default="auto",
+                        help="mmap : auto = seulement sur système de fichiers local")
+    parser.add_argument("--stats", default=os.environ.get("B3READER_STATS") or None,
+                        help="Journal TSV des débits, une ligne par fichier (défaut : $B3READER_STATS)")
+    parser.add_argument("--report", default=None, help="Afficher la synthèse d'un journal --stats et sortir")
+    args = parser.parse_args()
+
+    if args.report:
+        report(args.report)
+        return
+
+    reader = BlockReader(args.block_size)
+    errors = 0
+    for path in args.files:
+        start = time.perf_counter()
+        try:
+            digest, nbytes, mode = hash_file(path, reader, args.mmap)
+        except OSError as e:
+            print(f"b3_reader: {path}: {e.strerror or e}", file=sys.stderr)
+            errors += 1
+            continue
+        except subprocess.CalledProcessError as e:
+            sys.stderr.write(e.stderr.decode("utf-8", "replace") if e.stderr else f"b3_reader: {path}: b3sum\n")
+            errors += 1
+            continue
+        elapsed = time.perf_counter() - start
+        print(f"{digest}  {path}")
+        if args.stats:
+            with open(args.stats, "a", encoding="utf-8") as log:
+                log.write(f"{size_class(nbytes)}\t{nbytes}\t{elapsed:.6f}\t{mode}\n")
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Banc d'essai reproductible du scan (hashes_scans.sh) et de la suppression (delete_from_json.py)
+sur un montage réseau simulé (fsio.SimulatedFS), sans NAS ni données réelles.
+
+Le scan est émulé appel par appel, comme dans hashes_scans.sh :
+  - étape 1 (un seul processus) : deux parcours find (dossiers puis fichiers), puis pour chaque
+    fichier deux `stat` et un `xattr -p` (tampon incrémental) ;
+  - étape 2 (GNU parallel -j JOBS -n BATCH) : un bash par lot ; par fichier `[[ -e ]]` (nouvel
+    essai après 0,1 s), deux `stat`, le hash (b3sum, ou b3_reader.py au-delà de READER_MIN_SIZE)
+    et deux `xattr -w`.
+Chaque lancement de processus coûte --spawn-ms (Python : --python-spawn-ms) ; le hash coûte
+--hash-rate octets/s de CPU par travailleur ; les lectures passent par le lien partagé.
+
+Simulation à événements discrets sur horloge virtuelle : les travailleurs sont entrelacés appel
+par appel dans l'ordre du temps simulé, chacun prenant le lot suivant dès qu'il est libre ;
+même graine = mêmes résultats, quelle que soit la machine.
+"""
+import argparse
+import contextlib
+import csv
+import heapq
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+from collections import Counter
+
+from fsio import ATTR_HASH, ATTR_STAMP, PROFILES, SimulatedFS, TreeFS, VirtualClock, file_stamp
+READER_MIN_SIZE = 8 * 1024 * 1024
+
+
+class ScanModel:
+    """Coûts du scan : lancements de processus, tailles de lecture, vitesse du hash."""
+
+    def __init__(self, args):
+        self.spawn = args.spawn_ms / 1000
+        self.python_spawn = args.python_spawn_ms / 1000
+        self.hash_rate = args.hash_rate
+        self.b3sum_read = args.b3sum_read_size
+        self.reader_read = args.reader_block_size
+        self.use_reader = args.hasher == "reader"
+        self.reader_min_size = args.reader_min_size
+
+
+def step1(fs: SimulatedFS, roots, model: ScanModel):
+    """Sélection : parcours des dossiers puis des fichiers, tampon xattr des fichiers."""
+    for root in roots:
+        for _ in fs.walk(root):                          # find -type d
+            pass
+    to_hash = []
+    for root in roots:
+        for d, _dirs, files in fs.walk(root):            # find -type f
+            for name in files:
+                path = f"{d.rstrip('/')}/{name}"
+                try:
+                    fs.clock.advance(model.spawn)        # file_stamp : deux `stat` (taille, mtime)
+                    st = fs.stat(path)
+                    fs.clock.advance(model.spawn)
+                    fs.stat(path)
+                    stamp = file_stamp(st)
+                except OSError:
+                    to_hash.append(path)
+                    continue
+                fs.clock.advance(model.spawn)            # get_xattr
+                try:
+                    old = fs.getxattr(path, ATTR_STAMP)
+                except OSError:
+                    old = None
+                if old != stamp:
+                    to_hash.append(path)
+    return to_hash
+
+
+def hash_one(fs: SimulatedFS, path: str, model: ScanModel, buffers, missing: Counter, read: list):
+    """
+    robust_worker pour un fichier. Générateur : rend la main après chaque appel, pour que
+    l'ordonnanceur entrelace les travailleurs dans l'ordre du temps simulé.
+    """
+    exists = fs.exists(path)
+    yield
+    if not exists:
+        fs.clock.advance(0.1)
+        exists = fs.exists(path)
+        yield
+        if not exists:
+            missing["ENOENT"] += 1
+            return
+    try:
+        fs.clock.advance(model.spawn)
+        st = fs.stat(path)
+        yield
+        fs.clock.advance(model.spawn)
+        fs.stat(path)
+        yield
+    except OSError:
+        missing["STATFAIL"] += 1
+        return
+
+    reader = model.use_reader and st.st_size >= model.reader_min_size
+    fs.clock.advance(model.python_spawn if reader else model.spawn)
+    buf = buffers["reader" if reader else "b3sum"]
+    try:
+        with fs.open(path) as f:
+            yield
+            while True:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                read[0] += n
+                fs.clock.advance(n / model.hash_rate)
+                yield
+    except FileNotFoundError:
+        missing["ENOENT"] += 1
+        return
+    except OSError:
+        missing["HASHERR"] += 1
+        return
+
+    for attr, value in ((ATTR_HASH, "0" * 64), (ATTR_STAMP, file_stamp(st))):
+        fs.clock.advance(model.spawn)
+        try:
+            fs.setxattr(path, attr, value)
+        except OSError:
+            pass                                         # `|| true` dans le script
+        yield
+
+
+def step2(fs: SimulatedFS, files, jobs: int, batch: int, model: ScanModel, missing: Counter):
+    """GNU parallel : lots de `batch` fichiers, `jobs` travailleurs ; renvoie (fin, octets lus)."""
+    batches = iter(range(0, len(files), batch))
+    buffers = {"b3sum": memoryview(bytearray(model.b3sum_read)), "reader": memoryview(bytearray(model.reader_read))}
+    read = [0]
+
+    def worker():
+        # Chaque travailleur prend le lot suivant dès qu'il est libre
+        for i in batches:
+            fs.clock.advance(model.spawn)                # bash robust_worker
+            yield
+            for path in files[i:i + batch]:
+                yield from hash_one(fs, path, model, buffers, missing, read)
+
+    start = end = fs.clock.now()
+    heap = [(start, w, worker()) for w in range(jobs)]
+    heapq.heapify(heap)
+    while heap:
+        t, w, gen = heapq.heappop(heap)
+        fs.clock.t = t
+        try:
+            next(gen)
+        except StopIteration:
+            end = max(end, fs.clock.now())
+            continue
+        heapq.heappush(heap, (fs.clock.now(), w, gen))
+    return end, read[0]
+
+
+def make_fs(base: TreeFS, args, seed: int) -> SimulatedFS:
+    return SimulatedFS(
+        base, profile=args.profile, seed=seed, clock=VirtualClock(),
+        bandwidth=args.bandwidth, enoent_rate=args.enoent_rate, eio_rate=args.eio_rate,
+        drop_interval=args.drop_interval, drop_duration=args.drop_duration, drop_timeout=args.drop_timeout,
+    )
+
+
+def bench_scan(base: TreeFS, roots, args):
+    model = ScanModel(args)
+    rows = []
+    for jobs in args.jobs:
+        for batch in args.batch:
+            base.xattrs.clear()                          # premier scan : aucun tampon
+            fs = make_fs(base, args, args.seed)
+            missing = Counter()
+            files = step1(fs, roots, model)
+            t1 = fs.clock.now()
+            end, nbytes = step2(fs, files, jobs, batch, model, missing)
+            t2 = end - t1
+            rows.append({
+                "jobs": jobs, "batch": batch, "files": len(files),
+                "step1_s": round(t1, 2), "step2_s": round(t2, 2), "total_s": round(end, 2),
+                "mb_s": round(nbytes / (1024 * 1024) / t2, 1) if t2 else 0.0,
+                "files_s": round(len(files) / t2, 1) if t2 else 0.0,
+                "enoent": missing["ENOENT"], "statfail": missing["STATFAIL"], "hasherr": missing["HASHERR"],
+                "injected": sum(fs.injected.values()),
+            })
+    return rows
+
+
+def bench_delete(base: TreeFS, args):
+    """delete_from_json.py (suppression réelle, mais dans l'arborescence en mémoire)."""
+    from delete_from_json import delete_files_from_json
+
+    rng = random.Random(args.seed)
+    targets = rng.sample(sorted(base.files), min(args.delete, len(base.files)))
+    fs = make_fs(base, args, args.seed)
+    before = len(base.files)
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, "paths_to_delete.json")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(targets, f)
+        out = io.StringIO()
+        code = 0
+        with contextlib.redirect_stdout(out):
+            try:
+                delete_files_from_json(json_path, dry_run=False, log_path=os.path.join(tmp, "log.txt"), fs=fs)
+            except SystemExit as e:
+                code = e.code
+    elapsed = fs.clock.now()
+    deleted = before - len(base.files)
+    return {
+        "requested": len(targets), "deleted": deleted, "exit_code": code,
+        "elapsed_s": round(elapsed, 2), "files_s": round(deleted / elapsed, 1) if elapsed else 0.0,
+        "injected": dict(fs.injected),
+    }
+
+
+def print_table(rows):
+    if not rows:
+        print("(aucun résultat)")
+        return
+    cols = list(rows[0])
+    widths = [max(len(c), *(len(str(r[c])) for r in rows)) for c in cols]
+    print("  ".join(c.rjust(w) for c, w in zip(cols, widths)))
+    for r in rows:
+        print("  ".join(str(r[c]).rjust(w) for c, w in zip(cols, widths)))
+
+
+def int_list(value: str):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Banc d'essai reproductible du scan et de la suppression sur montage réseau simulé."
+    )
+    src = parser.add_mutually_exclusive_group()
+    src.add_argument("--csv", default=None, help="Arborescence d'un audit_hashes.csv (chemins et tailles seulement)")
+    src.add_argument("--synthetic", type=int, default=5000, help="Nombre de fichiers synthétiques (défaut : 5000)")
+    parser.add_argument("--median-size", type=int, default=1024 * 1024, help="Taille médiane synthétique (octets)")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="smb", help="Profil de latence (défaut : smb)")
+    parser.add_argument("--bandwidth", type=float, default=None, help="Débit du lien en octets/s (défaut : profil)")
+    parser.add_argument("--jobs", type=int_list, default=[1, 2, 4, 8], help="Valeurs de -j testées (ex. 1,2,4,8)")
+    parser.add_argument("--batch", type=int_list, default=[1, 4, 16], help="Valeurs de -n testées (ex. 1,4,16)")
+    parser.add_argument("--hasher", choices=["b3sum", "reader"], default="reader", help="HASHER du scan")
+    parser.add_argument("--reader-min-size", type=int, default=READER_MIN_SIZE, help="READER_MIN_SIZE (octets)")
+    parser.add_argument("--reader-block-size", type=int, default=16 * 1024 * 1024, help="Blocs de b3_reader.py")
+    parser.add_argument("--b3sum-read-size", type=int, default=64 * 1024, help="Taille des lectures de b3sum")
+    parser.add_argument("--hash-rate", type=float, default=1.5e9, help="Vitesse du hash par travailleur (octets/s)")
+    parser.add_argument("--spawn-ms", type=float, default=4.0, help="Coût d'un lancement de processus (ms)")
+    parser.add_argument("--python-spawn-ms", type=float, default=40.0, help="Coût d'un lancement de Python (ms)")
+    parser.add_argument("--enoent-rate", type=float, default=0.0, help="Probabilité d'ENOENT transitoire par appel")
+    parser.add_argument("--eio-rate", type=float, default=0.0, help="Probabilité d'EIO transitoire par appel")
+    parser.add_argument("--drop-interval", type=float, default=None, help="Intervalle moyen entre coupures du montage (s)")
+    parser.add_argument("--drop-duration", type=float, default=5.0, help="Durée d'une coupure (s)")
+    parser.add_argument("--drop-timeout", type=float, default=1.0, help="Attente avant échec pendant une coupure (s)")
+    parser.add_argument("--delete", type=int, default=0, help="Banc de suppression : nombre de fichiers supprimés")
+    parser.add_argument("--seed", type=int, default=0, help="Graine des tirages")
+    parser.add_argument("--output", default=None, help="CSV des résultats du scan")
+    args = parser.parse_args()
+
+    if args.csv:
+        base = TreeFS.from_csv(args.csv)
+        roots = sorted({"/" + p.strip("/").split("/", 1)[0] for p in base.files})
+    else:
+        base = TreeFS.synthetic(args.synthetic, seed=args.seed, median_size=args.median_size)
+        roots = ["/nas"]
+    total = sum(size for size, _ in base.files.values())
+    print(f"Arborescence : {len(base.files)} fichiers, {total / (1024 ** 3):.2f} GB, profil {args.profile}",
+          file=sys.stderr)
+
+    rows = bench_scan(base, roots, args)
+    print_table(rows)
+    if args.output:
+        with open(args.output, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"Résultats sauvegardés : {args.output}")
+
+    if args.delete:
+        result = bench_delete(base, args)
+        print("\nSuppression :", ", ".join(f"{k}={v}" for k, v in result.items()))
+
+
+if __name__ == "__main__":
+    main()
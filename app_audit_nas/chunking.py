@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+"""
+Estimation de la duplication partielle par découpage en blocs définis par le contenu (CDC).
+
+Chaque fichier est lu une seule fois, par gros blocs (b3_reader.BlockReader). Les frontières
+de blocs de contenu sont placées par un hash glissant (somme sur une fenêtre de WINDOW octets
+d'une table aléatoire, calculée en vectoriel par numpy) : une insertion ou une suppression ne
+décale que les blocs voisins, ce qui fait ressortir les quasi-copies (vidéos réexportées,
+journaux complétés, images de VM).
+
+Chaque bloc de contenu est identifié par une empreinte BLAKE2b de 16 octets. L'index reste
+borné : seules les empreintes multiples de 2^s sont conservées, s augmentant dès que l'index
+dépasse --max-entries, et les octets partagés sont estimés en multipliant par 2^s. Le tirage
+dépend du contenu : un même bloc est retenu ou écarté dans tous les fichiers.
+"""
+import argparse
+import csv
+import hashlib
+import os
+import sys
+from collections import defaultdict
+from itertools import combinations
+
+import numpy as np
+
+from b3_reader import DEFAULT_BLOCK_SIZE, BlockReader
+
+WINDOW = 64
+AVG_CHUNK_SIZE = 256 * 1024
+MIN_FILE_SIZE = 64 * 1024 * 1024
+MAX_INDEX_ENTRIES = 2_000_000
+MAX_FILES_PER_CHUNK = 64      # au-delà (ex. blocs de zéros), le bloc n'alimente plus les paires
+FINGERPRINT_SIZE = 16
+GEAR = np.random.default_rng(0x4E4153).integers(0, 2 ** 32, size=256, dtype=np.uint32)
+
+
+def format_bytes(n: float) -> str:
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if abs(n) < 1024 or unit == "TB":
+            return f"{n:.2f} {unit}"
+        n /= 1024
+
+
+class Chunker:
+    """
+    Découpage en flux : feed() reçoit les blocs lus successivement et renvoie les blocs de
+    contenu terminés [(empreinte, taille)] ; finish() renvoie le dernier.
+    """
+
+    def __init__(self, avg_size: int = AVG_CHUNK_SIZE):
+        self.mask = np.uint32((1 << max(1, int(round(np.log2(avg_size))))) - 1)
+        self.min_size = avg_size // 4
+        self.max_size = avg_size * 4
+        self.reset()
+
+    def reset(self):
+        self.offset = 0                   # octets déjà reçus
+        self.last_cut = 0
+        self.hasher = hashlib.blake2b(digest_size=FINGERPRINT_SIZE)
+        self.tail = np.zeros(WINDOW, dtype=np.uint32)   # table des WINDOW derniers octets
+
+    def _cut_candidates(self, data: np.ndarray) -> np.ndarray:
+        g = np.concatenate([self.tail, GEAR[data]])
+        csum = np.cumsum(g, dtype=np.uint32)
+        window = csum[WINDOW:] - csum[:-WINDOW]   # somme glissante mod 2^32 (débordements compensés)
+        self.tail = g[-WINDOW:]
+        # Bits de poids faible uniformes (somme de valeurs aléatoires) : masque direct
+        np.bitwise_and(window, self.mask, out=window)
+        hits = np.flatnonzero(window == 0)
+        return hits + (self.offset + 1)   # frontière juste après l'octet concerné
+
+    def feed(self, block) -> list:
+        data = np.frombuffer(block, dtype=np.uint8)
+        start = self.offset
+        cuts = self._cut_candidates(data)
+        end = start + len(data)
+        out = []
+        while True:
+            i = np.searchsorted(cuts, self.last_cut + self.min_size)
+            limit = self.last_cut + self.max_size
+            if i < len(cuts) and cuts[i] <= limit:
+                cut = int(cuts[i])
+            elif limit <= end:
+                cut = limit
+            else:
+                break
+            self.hasher.update(block[max(self.last_cut, start) - start:cut - start])
+            out.append((self.hasher.digest(), cut - self.last_cut))
+            self.hasher = hashlib.blake2b(digest_size=FINGERPRINT_SIZE)
+            self.last_cut = cut
+        self.hasher.update(block[max(self.last_cut, start) - start:])
+        self.offset = end
+        return out
+
+    def finish(self) -> list:
+        out = []
+        if self.offset > self.last_cut:
+            out.append((self.hasher.digest(), self.offset - self.last_cut))
+        self.reset()
+        return out
+
+
+class ChunkIndex:
+    """Index des empreintes échantillonnées : empreinte -> [taille, occurrences, fichiers]."""
+
+    def __init__(self, max_entries: int = MAX_INDEX_ENTRIES):
+        self.max_entries = max_entries
+        self.shift = 0
+        self.entries = {}
+        self.files = []            # [(chemin, octets lus)]
+
+    def _sampled(self, fp: bytes) -> bool:
+        return not int.from_bytes(fp[:8], "little") & ((1 << self.shift) - 1)
+
+    def add_file(self, path: str, chunks) -> int:
+        file_id = len(self.files)
+        total = 0
+        for fp, size in chunks:
+            total += size
+            if not self._sampled(fp):
+                continue
+            entry = self.entries.get(fp)
+            if entry is None:
+                entry = self.entries[fp] = [size, 0, []]
+            entry[1] += 1
+            if (not entry[2] or entry[2][-1] != file_id) and len(entry[2]) < MAX_FILES_PER_CHUNK:
+                entry[2].append(file_id)
+            if len(self.entries) > self.max_entries:
+                self._resample()
+        self.files.append((path, total))
+        return total
+
+    def _resample(self):
+        # Échantillonnage deux fois plus sélectif jusqu'à repasser sous la limite
+        while len(self.entries) > self.max_entries:
+            self.shift += 1
+            self.entries = {fp: e for fp, e in self.entries.items() if self._sampled(fp)}
+
+    @property
+    def scale(self) -> int:
+        return 1 << self.shift
+
+    def summary(self):
+        """(octets lus, octets uniques estimés après déduplication par blocs)."""
+        total = sum(size for _, size in self.files)
+        unique = sum(e[0] for e in self.entries.values()) * self.scale
+        return total, min(unique, total)
+
+    def shared_by_file(self) -> np.ndarray:
+        """Octets estimés de chaque fichier présents ailleurs (autre fichier ou plus tôt dans le même)."""
+        shared = np.zeros(len(self.files), dtype=np.float64)
+        for size, occurrences, file_ids in self.entries.values():
+            if occurrences > 1:
+                for f in file_ids:
+                    shared[f] += size * self.scale
+        return shared
+
+    def shared_pairs(self) -> dict:
+        """{(fichier a, fichier b): octets partagés estimés}."""
+        pairs = defaultdict(float)
+        for size, _, file_ids in self.entries.values():
+            if len(file_ids) > 1:
+                for a, b in combinations(file_ids, 2):
+                    pairs[(a, b)] += size * self.scale
+        return pairs
+
+
+def select_files(csv_path: str, min_size: int, under=None):
+    """Fichiers d'un CSV d'audit d'au moins min_size octets, du plus gros au plus petit."""
+    selected = []
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if (row.get("type") or "file").strip().lower() != "file":
+                continue
+            if under and not row["path"].startswith(under.rstrip("/") + "/"):
+                continue
+            try:
+                size = int(float(row["size_bytes"]))
+            except (TypeError, ValueError):
+                continue
+            if size >= min_size:
+                selected.append((size, row["path"]))
+    selected.sort(reverse=True)
+    return [p for _, p in selected]
+
+
+def scan(paths, index: ChunkIndex, chunker: Chunker, reader: BlockReader):
+    for n, path in enumerate(paths, start=1):
+        try:
+            chunks = []
+            for block in reader.iter_blocks(path):
+                chunks.extend(chunker.feed(block))
+            chunks.extend(chunker.finish())
+        except OSError as e:
+            chunker.reset()
+            print(f"ATTENTION illisible : {path} ({e.strerror or e})", file=sys.stderr)
+            continue
+        total = index.add_file(path, chunks)
+        print(f"[{n}/{len(paths)}] {format_bytes(total):>12}  {len(chunks):>8} blocs  {path}", file=sys.stderr)
+
+
+def report(index: ChunkIndex, top: int, output=None):
+    total, unique = index.summary()
+    print(f"\nFichiers analysés : {len(index.files)} ({format_bytes(total)})")
+    print(f"Échantillonnage : 1 bloc sur {index.scale} ({len(index.entries)} empreintes)")
+    print(f"Volume après déduplication par blocs (estimé) : {format_bytes(unique)}")
+    print(f"Économie estimée : {format_bytes(total - unique)} ({(total - unique) / total * 100 if total else 0:.1f} %)")
+
+    pairs = index.shared_pairs()
+    ranked = sorted(pairs.items(), key=lambda kv: kv[1], reverse=True)
+    if ranked:
+        print("\nPaires de fichiers les plus proches (octets partagés estimés) :")
+        for (a, b), shared in ranked[:top]:
+            smaller = min(index.files[a][1], index.files[b][1]) or 1
+            print(f"{format_bytes(shared):>12} {min(shared / smaller, 1) * 100:5.1f} %  "
+                  f"{index.files[a][0]}  <->  {index.files[b][0]}")
+
+    shared = index.shared_by_file()
+    by_dir = defaultdict(lambda: [0.0, 0])
+    for (path, size), s in zip(index.files, shared):
+        agg = by_dir[os.path.dirname(os.path.abspath(path))]
+        agg[0] += min(s, size)
+        agg[1] += size
+    dirs = sorted(by_dir.items(), key=lambda kv: kv[1][0], reverse=True)
+    dirs = [(d, s, size) for d, (s, size) in dirs if s > 0]
+    if dirs:
+        print("\nDossiers contenant le plus de blocs présents ailleurs :")
+        for d, s, size in dirs[:top]:
+            print(f"{format_bytes(s):>12} / {format_bytes(size):<12} {d}")
+
+    if output:
+        with open(output, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f, quoting=csv.QUOTE_NONNUMERIC)
+            writer.writerow(["path_a", "path_b", "shared_bytes", "size_a", "size_b"])
+            for (a, b), s in ranked:
+                writer.writerow([index.files[a][0], index.files[b][0], int(s), index.files[a][1], index.files[b][1]])
+        print(f"\nPaires sauvegardées : {output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Estimation des octets partagés entre gros fichiers (découpage par le contenu)."
+    )
+    parser.add_argument("files", nargs="*", help="Fichiers à analyser (sinon : sélection dans --csv)")
+    parser.add_argument("--csv", default=None, help="CSV d'audit : analyse des fichiers d'au moins --min-size")
+    parser.add_argument("--min-size", type=int, default=MIN_FILE_SIZE, help="Taille minimale (défaut : 64 MiB)")
+    parser.add_argument("--under", default=None, help="Restreindre la sélection --csv à ce dossier")
+    parser.add_argument("--avg-chunk", type=int, default=AVG_CHUNK_SIZE, help="Taille moyenne des blocs (défaut : 256 KiB)")
+    parser.add_argument("--max-entries", type=int, default=MAX_INDEX_ENTRIES,
+                        help="Empreintes conservées au plus (mémoire bornée, échantillonnage au-delà)")
+    parser.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE, help="Taille des lectures (octets)")
+    parser.add_argument("--top", type=int, default=20, help="Nombre de paires / dossiers affichés")
+    parser.add_argument("--output", default=None, help="CSV de toutes les paires (octets partagés estimés)")
+    args = parser.parse_args()
+
+    paths = list(args.files)
+    if args.csv:
+        paths += select_files(args.csv, args.min_size, args.under)
+    if not paths:
+        parser.error("aucun fichier à analyser (donner des fichiers ou --csv)")
+
+    index = ChunkIndex(args.max_entries)
+    scan(paths, index, Chunker(args.avg_chunk), BlockReader(args.block_size))
+    report(index, args.top, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
+import calendar
 import json
 import os
 import sys
+import time
 import unicodedata
 from pathlib import Path
 from datetime import datetime
@@ -22,6 +24,29 @@ def is_under_root(path: Path, root: Path | None) -> bool:
     except Exception:
         return False
 
+def audit_mtime(st_mtime: float) -> int:
+    # Même convention que hashes_scans.sh (MTIME_TZ=UTC par défaut, sinon heure locale)
+    if os.environ.get("MTIME_TZ", "UTC") == "UTC":
+        return int(st_mtime)
+    return calendar.timegm(time.localtime(int(st_mtime)))
+
+def changed_since_audit(found: Path, snap, variants, fs):
+    """Compare le fichier au snapshot d'audit ; renvoie la raison du refus, ou None."""
+    record = None
+    for v in [str(found), *variants, os.path.normpath(variants[0])]:
+        record = snap.lookup(v)
+        if record is not None:
+            break
+    if record is None:
+        return "absent du snapshot d'audit"
+    _, _, size, mtime, _ = record
+    st = fs.stat(found)
+    if size is not None and st.st_size != size:
+        return f"taille modifiée depuis l'audit ({size} -> {st.st_size} octets)"
+    if mtime is not None and audit_mtime(st.st_mtime) != mtime:
+        return "date de modification changée depuis l'audit"
+    return None
+
 def load_paths(json_path: Path):
     with open(json_path, "r", encoding="utf-8") as f:
         data = json.load(f)
@@ -34,7 +59,13 @@ def load_paths(json_path: Path):
             seen.add(s); out.append(s)
     return out
 
-def delete_files_from_json(json_path, dry_run=True, log_path="delete_log.txt", root_dir: str | None = None):
+def delete_files_from_json(json_path, dry_run=True, log_path="delete_log.txt", root_dir: str | None = None,
+                           snapshot_path: str | None = None, fs=None):
+    # fs : couche d'accès au système de fichiers (fsio.py), remplaçable pour les bancs d'essai
+    if fs is None:
+        from fsio import RealFS
+        fs = RealFS()
+
     json_path = Path(json_path)
     if not json_path.exists():
         print(f"Fichier JSON introuvable : {json_path}")
@@ -51,6 +82,14 @@ def delete_files_from_json(json_path, dry_run=True, log_path="delete_log.txt", r
         print(f"Racine invalide ou inexistante : {root}")
         sys.exit(1)
 
+    snap = None
+    if snapshot_path:
+        from snapshot import Snapshot, is_snapshot
+        if not is_snapshot(snapshot_path):
+            print(f"Snapshot d'audit invalide ou introuvable : {snapshot_path}")
+            sys.exit(1)
+        snap = Snapshot(snapshot_path)
+
     log_entries = []
     ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     print(f"\n=== Suppression lancée à {ts} (dry_run={dry_run}) ===\n")
@@ -68,7 +107,7 @@ def delete_files_from_json(json_path, dry_run=True, log_path="delete_log.txt", r
             continue
 
         # existence (essaie NFC puis NFD)
-        found = next((Path(v) for v in variants if Path(v).exists()), None)
+        found = next((Path(v) for v in variants if fs.exists(v)), None)
         probe = Path(variants[0])
 
         if found is None:
@@ -78,21 +117,34 @@ def delete_files_from_json(json_path, dry_run=True, log_path="delete_log.txt", r
             continue
 
         # symlink: on ne suit pas, on refuse (plus sûr sur serveur)
-        if found.is_symlink():
+        if fs.islink(found):
             msg = f"Refusé (symlink) : {found}"
             print("⚠️", msg)
             log_entries.append(f"[REFUSED] {msg}")
             errs += 1
             continue
 
-        if not found.is_file():
+        if not fs.isfile(found):
             msg = f"Non supprimé (pas un fichier) : {found}"
             print("⚠️", msg)
             log_entries.append(f"[WARN] {msg}")
             continue
 
+        # contrôle contre le snapshot d'audit : on ne supprime que ce qui a été audité tel quel
+        if snap is not None:
+            try:
+                reason = changed_since_audit(found, snap, variants, fs)
+            except OSError as e:
+                reason = f"stat impossible : {e}"
+            if reason:
+                msg = f"Refusé ({reason}) : {found}"
+                print("⚠️", msg)
+                log_entries.append(f"[REFUSED] {msg}")
+                errs += 1
+                continue
+
         # permissions dossier parent
-        if not os.access(found.parent, os.W_OK):
+        if not fs.access(found.parent, os.W_OK):
             msg = f"Permission refusée sur le dossier parent : {found.parent}"
             print("ERREUR", msg)
             log_entries.append(f"[ERR] {msg}")
@@ -105,7 +157,7 @@ def delete_files_from_json(json_path, dry_run=True, log_path="delete_log.txt", r
                 print("", msg)
                 log_entries.append(f"[DRY] {msg}")
             else:
-                found.unlink()
+                fs.unlink(found)
                 msg = f"Supprimé : {found}"
                 print("SUPPRESSION VALIDÉE", msg)
                 log_entries.append(f"[OK] {msg}")
@@ -115,6 +167,9 @@ def delete_files_from_json(json_path, dry_run=True, log_path="delete_log.txt", r
             log_entries.append(f"[ERR] {msg}")
             errs += 1
 
+    if snap is not None:
+        snap.close()
+
     with open(log_path, "a", encoding="utf-8") as log_file:
         log_file.write(f"\n--- {ts} ---\n")
         for entry in log_entries:
@@ -126,7 +181,7 @@ def delete_files_from_json(json_path, dry_run=True, log_path="delete_log.txt", r
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Usage : python delete_from_json.py <fichier.json> [--force] [--root /chemin/racine] [--log delete_log.txt]")
+        print("Usage : python delete_from_json.py <fichier.json> [--force] [--root /chemin/racine] [--log delete_log.txt] [--snapshot audit_hashes.nasnap]")
         sys.exit(1)
 
     json_file = sys.argv[1]
@@ -134,6 +189,7 @@ if __name__ == "__main__":
     # options simples sans casser l'interface d’origine
     root = None
     log = "delete_log.txt"
+    snapshot = None
     if "--root" in sys.argv:
         i = sys.argv.index("--root")
         if i + 1 < len(sys.argv):
@@ -142,6 +198,10 @@ if __name__ == "__main__":
         i = sys.argv.index("--log")
         if i + 1 < len(sys.argv):
             log = sys.argv[i + 1]
+    if "--snapshot" in sys.argv:
+        i = sys.argv.index("--snapshot")
+        if i + 1 < len(sys.argv):
+            snapshot = sys.argv[i + 1]
 
     # confirmation minimale si on quitte le dry-run
     if not dry:
@@ -150,4 +210,4 @@ if __name__ == "__main__":
             print("Annulé.")
             sys.exit(0)
 
-    delete_files_from_json(json_file, dry_run=dry, log_path=log, root_dir=root)
+    delete_files_from_json(json_file, dry_run=dry, log_path=log, root_dir=root, snapshot_path=snapshot)
@@ -0,0 +1,506 @@
+#!/usr/bin/env python3
+"""
+Couche d'accès au système de fichiers, injectable dans les outils Python (delete_from_json,
+watch_snapshot, b3_reader) et dans le banc d'essai bench_fs.py.
+
+- RealFS      : appels directs (os.scandir, os.stat, open, os.unlink, xattr) ;
+- TreeFS      : arborescence en mémoire (à partir d'un CSV d'audit ou synthétique), lectures
+                de zéros : aucun accès disque, aucune donnée réelle nécessaire ;
+- SimulatedFS : enveloppe une autre couche et simule un montage réseau : latence par appel
+                (loi log-normale par type d'appel), débit plafonné partagé, erreurs transitoires
+                ENOENT / EIO et coupures du montage. Tirages par générateur initialisé (--seed) :
+                résultats reproductibles.
+
+Horloges : SleepClock (attentes réelles, pour le code multi-thread) ou VirtualClock (temps
+simulé, sans attente : un banc de plusieurs heures s'exécute en quelques secondes).
+"""
+import errno
+import os
+import random
+import stat
+import subprocess
+import threading
+import time
+from collections import Counter
+
+# Tampons xattr de hashes_scans.sh (set_xattr) : hash BLAKE3 et « <taille>:<mtime epoch> »
+ATTR_HASH = "com.uniris.blake3"
+ATTR_STAMP = "com.uniris.stamp"
+
+# Profils de latence : (médiane en secondes, sigma log-normal) par type d'appel,
+# coût supplémentaire par entrée de dossier et débit du lien (octets/s)
+PROFILES = {
+    "local": {
+        "stat": (20e-6, 0.3), "scandir": (50e-6, 0.3), "open": (30e-6, 0.3), "read": (5e-6, 0.3),
+        "unlink": (50e-6, 0.3), "xattr": (20e-6, 0.3), "per_entry": 2e-6, "bandwidth": 500e6,
+    },
+    "smb": {
+        "stat": (1.5e-3, 0.6), "scandir": (4e-3, 0.6), "open": (3e-3, 0.6), "read": (0.5e-3, 0.5),
+        "unlink": (3e-3, 0.6), "xattr": (2e-3, 0.6), "per_entry": 80e-6, "bandwidth": 110e6,
+    },
+    "nfs": {
+        "stat": (0.8e-3, 0.5), "scandir": (2e-3, 0.5), "open": (1.5e-3, 0.5), "read": (0.3e-3, 0.5),
+        "unlink": (2e-3, 0.5), "xattr": (1e-3, 0.5), "per_entry": 30e-6, "bandwidth": 110e6,
+    },
+}
+
+
+class SleepClock:
+    """Temps réel : les latences simulées sont de vraies attentes."""
+
+    def now(self) -> float:
+        return time.monotonic()
+
+    def advance(self, seconds: float):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def wait_until(self, t: float):
+        self.advance(t - self.now())
+
+
+class VirtualClock:
+    """Temps simulé : avance sans attendre ; `t` peut être repositionné (un travailleur à la fois)."""
+
+    def __init__(self, t: float = 0.0):
+        self.t = t
+
+    def now(self) -> float:
+        return self.t
+
+    def advance(self, seconds: float):
+        if seconds > 0:
+            self.t += seconds
+
+    def wait_until(self, t: float):
+        self.t = max(self.t, t)
+
+
+class _EntryList:
+    """Résultat de scandir matérialisé, utilisable comme os.scandir (with / itération)."""
+
+    def __init__(self, entries):
+        self.entries = entries
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __iter__(self):
+        return iter(self.entries)
+
+
+class RealFS:
+    """Accès direct. Les autres couches reprennent la même interface."""
+
+    def scandir(self, path):
+        return os.scandir(path)
+
+    def stat(self, path):
+        return os.stat(path)
+
+    def lstat(self, path):
+        return os.lstat(path)
+
+    def open(self, path, mode="rb", buffering=-1):
+        return open(path, mode, buffering=buffering)
+
+    def unlink(self, path):
+        os.unlink(path)
+
+    def access(self, path, mode) -> bool:
+        return os.access(path, mode)
+
+    def getxattr(self, path, name: str):
+        if hasattr(os, "getxattr"):
+            try:
+                return os.getxattr(path, name).decode("utf-8", "replace")
+            except OSError:
+                return None
+        # macOS : même commande que hashes_scans.sh
+        out = subprocess.run(["xattr", "-p", name, "--", os.fspath(path)], capture_output=True, text=True)
+        return out.stdout.strip() if out.returncode == 0 else None
+
+    def setxattr(self, path, name: str, value: str):
+        if hasattr(os, "setxattr"):
+            os.setxattr(path, name, value.encode("utf-8"))
+        else:
+            subprocess.run(["xattr", "-w", name, value, "--", os.fspath(path)], capture_output=True, check=True)
+
+    # --- Dérivés (passent par stat / lstat / scandir de la couche) ---------------------
+    def exists(self, path) -> bool:
+        try:
+            self.stat(path)
+        except (OSError, ValueError):
+            return False
+        return True
+
+    def lexists(self, path) -> bool:
+        try:
+            self.lstat(path)
+        except (OSError, ValueError):
+            return False
+        return True
+
+    def _mode_is(self, path, test, follow=True) -> bool:
+        try:
+            st = self.stat(path) if follow else self.lstat(path)
+        except (OSError, ValueError):
+            return False
+        return test(st.st_mode)
+
+    def isdir(self, path) -> bool:
+        return self._mode_is(path, stat.S_ISDIR)
+
+    def isfile(self, path) -> bool:
+        return self._mode_is(path, stat.S_ISREG)
+
+    def islink(self, path) -> bool:
+        return self._mode_is(path, stat.S_ISLNK, follow=False)
+
+    def walk(self, top):
+        """
+        Équivalent de os.walk(top) (followlinks=False), itératif : un lien vers un dossier est
+        listé dans les dossiers mais pas parcouru ; élagage possible de la liste des sous-dossiers.
+        """
+        stack = [top]
+        while stack:
+            top = stack.pop()
+            dirs, files, links = [], [], set()
+            try:
+                with self.scandir(top) as it:
+                    for entry in it:
+                        try:
+                            is_dir = entry.is_dir()
+                        except OSError:
+                            is_dir = False
+                        if is_dir:
+                            dirs.append(entry.name)
+                            if entry.is_symlink():
+                                links.add(entry.name)
+                        else:
+                            files.append(entry.name)
+            except OSError:
+                continue
+            yield top, dirs, files
+            # Ordre descendant de os.walk : sous-dossiers empilés à l'envers
+            stack.extend(os.path.join(top, name) for name in reversed(dirs) if name not in links)
+
+
+def file_stamp(st) -> str:
+    """Tampon au format de file_stamp() dans hashes_scans.sh."""
+    return f"{st.st_size}:{int(st.st_mtime)}"
+
+
+def write_hash_stamp(fs, path, file_hash: str, st):
+    """Écrit le hash et le tampon comme l'étape 2 du scan (échec ignoré, comme `|| true`)."""
+    for attr, value in ((ATTR_HASH, file_hash), (ATTR_STAMP, file_stamp(st))):
+        try:
+            fs.setxattr(path, attr, value)
+        except OSError:
+            pass
+
+
+class _TreeEntry:
+    """Entrée de TreeFS, interface de os.DirEntry."""
+
+    def __init__(self, fs, path: str, name: str):
+        self._fs = fs
+        self.path = path
+        self.name = name
+
+    def is_dir(self, follow_symlinks=True) -> bool:
+        return self.path in self._fs.dirs
+
+    def is_file(self, follow_symlinks=True) -> bool:
+        return self.path in self._fs.files
+
+    def is_symlink(self) -> bool:
+        return False
+
+    def stat(self, follow_symlinks=True):
+        return self._fs.stat(self.path)
+
+
+class _ZeroFile:
+    """Fichier de TreeFS : renvoie des zéros (le contenu n'est jamais copié)."""
+
+    def __init__(self, size: int):
+        self.remaining = size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def fileno(self) -> int:
+        return -1   # fadvise / fcntl échouent et sont ignorés par les appelants
+
+    def readinto(self, buffer) -> int:
+        n = min(len(buffer), self.remaining)
+        self.remaining -= n
+        return n
+
+    def read(self, size: int = -1) -> bytes:
+        n = self.remaining if size is None or size < 0 else min(size, self.remaining)
+        self.remaining -= n
+        return bytes(n)
+
+    def close(self):
+        pass
+
+
+class TreeFS(RealFS):
+    """Arborescence en mémoire : {fichier: [taille, mtime]}, {dossier: {noms}}."""
+
+    def __init__(self):
+        self.files = {}
+        self.dirs = {"/": set()}
+        self.dir_mtimes = {}
+        self.xattrs = {}
+
+    def add_dir(self, path: str, mtime: float = 0.0):
+        path = path.rstrip("/") or "/"
+        if path not in self.dirs:
+            parent, name = os.path.split(path)
+            parent = parent or "/"
+            self.add_dir(parent)
+            self.dirs[parent].add(name)
+            self.dirs[path] = set()
+        if mtime:
+            self.dir_mtimes[path] = mtime
+
+    def add_file(self, path: str, size: int, mtime: float = 0.0):
+        parent, name = os.path.split(path)
+        parent = parent or "/"
+        self.add_dir(parent)
+        self.dirs[parent].add(name)
+        self.files[path] = [size, mtime]
+
+    @classmethod
+    def from_csv(cls, csv_path: str):
+        """Arborescence d'un audit_hashes.csv (chemins, tailles, dates) : aucune donnée lue."""
+        import calendar
+        import csv
+
+        fs = cls()
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                try:
+                    mtime = calendar.timegm(time.strptime(row["mtime"], "%Y-%m-%d %H:%M:%S"))
+                except ValueError:
+                    mtime = 0
+                if (row.get("type") or "file") == "directory":
+                    fs.add_dir(row["path"], mtime)
+                else:
+                    try:
+                        size = int(float(row["size_bytes"] or 0))
+                    except ValueError:
+                        size = 0
+                    fs.add_file(row["path"], size, mtime)
+        return fs
+
+    @classmethod
+    def synthetic(cls, n_files: int, seed: int = 0, root: str = "/nas", per_dir: int = 200,
+                  median_size: int = 2 * 1024 * 1024, sigma: float = 2.0):
+        """Arborescence synthétique : tailles log-normales (beaucoup de petits fichiers, quelques très gros)."""
+        rng = random.Random(seed)
+        fs = cls()
+        for i in range(n_files):
+            d = f"{root}/d{i // (per_dir * per_dir):03d}/s{(i // per_dir) % per_dir:03d}"
+            fs.add_file(f"{d}/f{i:07d}.bin", int(rng.lognormvariate(0, sigma) * median_size), 1_600_000_000 + i)
+        return fs
+
+    def _stat_result(self, mode: int, size: int, mtime: float):
+        ns = int(mtime * 1_000_000_000)
+        return os.stat_result(
+            (mode, 0, 0, 1, 0, 0, size, int(mtime), int(mtime), int(mtime)),
+            {"st_atime": mtime, "st_mtime": mtime, "st_ctime": mtime,
+             "st_atime_ns": ns, "st_mtime_ns": ns, "st_ctime_ns": ns},
+        )
+
+    def stat(self, path):
+        path = os.fspath(path)
+        if path in self.files:
+            size, mtime = self.files[path]
+            return self._stat_result(stat.S_IFREG | 0o644, size, mtime)
+        key = path.rstrip("/") or "/"
+        if key in self.dirs:
+            return self._stat_result(stat.S_IFDIR | 0o755, 0, self.dir_mtimes.get(key, 0))
+        raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), path)
+
+    lstat = stat
+
+    def scandir(self, path):
+        key = os.fspath(path).rstrip("/") or "/"
+        if key not in self.dirs:
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), key)
+        base = "" if key == "/" else key
+        return _EntryList([_TreeEntry(self, f"{base}/{name}", name) for name in sorted(self.dirs[key])])
+
+    def open(self, path, mode="rb", buffering=-1):
+        path = os.fspath(path)
+        if path not in self.files:
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), path)
+        return _ZeroFile(self.files[path][0])
+
+    def unlink(self, path):
+        path = os.fspath(path)
+        if path not in self.files:
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), path)
+        del self.files[path]
+        parent, name = os.path.split(path)
+        self.dirs[parent].discard(name)
+        self.xattrs.pop(path, None)
+
+    def access(self, path, mode) -> bool:
+        return self.exists(path)
+
+    def getxattr(self, path, name: str):
+        return self.xattrs.get(os.fspath(path), {}).get(name)
+
+    def setxattr(self, path, name: str, value: str):
+        path = os.fspath(path)
+        if path not in self.files:
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), path)
+        self.xattrs.setdefault(path, {})[name] = value
+
+
+class _SimulatedFile:
+    """Fichier ouvert via SimulatedFS : chaque lecture paie une latence et passe par le lien."""
+
+    def __init__(self, fs, f, path):
+        self._fs = fs
+        self._f = f
+        self._path = path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def fileno(self) -> int:
+        return self._f.fileno()
+
+    def readinto(self, buffer) -> int:
+        self._fs._call("read", self._path)
+        n = self._f.readinto(buffer)
+        self._fs._transfer(n or 0)
+        return n
+
+    def read(self, size: int = -1) -> bytes:
+        self._fs._call("read", self._path)
+        data = self._f.read(size)
+        self._fs._transfer(len(data))
+        return data
+
+    def close(self):
+        self._f.close()
+
+
+class SimulatedFS(RealFS):
+    """
+    Montage réseau simulé au-dessus d'une autre couche (RealFS ou TreeFS).
+
+    enoent_rate / eio_rate : probabilité d'échec transitoire par appel ;
+    drop_interval / drop_duration : coupures du montage (intervalle moyen, durée) pendant
+    lesquelles tous les appels échouent en EIO après drop_timeout secondes.
+    """
+
+    def __init__(self, base=None, profile: str = "smb", seed: int = 0, clock=None,
+                 bandwidth: float | None = None, enoent_rate: float = 0.0, eio_rate: float = 0.0,
+                 drop_interval: float | None = None, drop_duration: float = 5.0, drop_timeout: float = 1.0):
+        self.base = base if base is not None else RealFS()
+        self.profile = dict(PROFILES[profile])
+        self.rng = random.Random(seed)
+        self.clock = clock if clock is not None else VirtualClock()
+        self.bandwidth = bandwidth or self.profile["bandwidth"]
+        self.enoent_rate = enoent_rate
+        self.eio_rate = eio_rate
+        self.drop_interval = drop_interval
+        self.drop_duration = drop_duration
+        self.drop_timeout = drop_timeout
+        self._drop_rng = random.Random(seed ^ 0x5EED)
+        self._next_drop = self._drop_rng.expovariate(1 / drop_interval) if drop_interval else None
+        self.link_free = 0.0
+        self.lock = threading.Lock()
+        self.calls = Counter()
+        self.injected = Counter()
+        self.bytes_read = 0
+
+    def _in_drop(self, now: float) -> bool:
+        while self._next_drop is not None and now >= self._next_drop + self.drop_duration:
+            self._next_drop += self.drop_duration + self._drop_rng.expovariate(1 / self.drop_interval)
+        return self._next_drop is not None and now >= self._next_drop
+
+    def _call(self, op: str, path, extra: float = 0.0):
+        with self.lock:
+            self.calls[op] += 1
+            if self._in_drop(self.clock.now()):
+                self.injected["drop"] += 1
+                delay, failure = self.drop_timeout, OSError(errno.EIO, "montage indisponible (simulé)", os.fspath(path))
+            else:
+                median, sigma = self.profile[op]
+                delay = median * self.rng.lognormvariate(0, sigma) + extra
+                r = self.rng.random()
+                failure = None
+                if r < self.enoent_rate:
+                    self.injected["ENOENT"] += 1
+                    failure = FileNotFoundError(errno.ENOENT, "disparu (simulé)", os.fspath(path))
+                elif r < self.enoent_rate + self.eio_rate:
+                    self.injected["EIO"] += 1
+                    failure = OSError(errno.EIO, "erreur d'E/S (simulée)", os.fspath(path))
+        self.clock.advance(delay)
+        if failure is not None:
+            raise failure
+
+    def _transfer(self, nbytes: int):
+        if not nbytes:
+            return
+        with self.lock:
+            start = max(self.clock.now(), self.link_free)
+            self.link_free = start + nbytes / self.bandwidth
+            end = self.link_free
+            self.bytes_read += nbytes
+        self.clock.wait_until(end)
+
+    def scandir(self, path):
+        entries = list(self.base.scandir(path))
+        self._call("scandir", path, extra=self.profile["per_entry"] * len(entries))
+        return _EntryList(entries)
+
+    def stat(self, path):
+        self._call("stat", path)
+        return self.base.stat(path)
+
+    def lstat(self, path):
+        self._call("stat", path)
+        return self.base.lstat(path)
+
+    def open(self, path, mode="rb", buffering=-1):
+        self._call("open", path)
+        return _SimulatedFile(self, self.base.open(path, mode, buffering), path)
+
+    def unlink(self, path):
+        self._call("unlink", path)
+        self.base.unlink(path)
+
+    def access(self, path, mode) -> bool:
+        try:
+            self._call("stat", path)
+        except OSError:
+            return False
+        return self.base.access(path, mode)
+
+    def getxattr(self, path, name: str):
+        self._call("xattr", path)
+        return self.base.getxattr(path, name)
+
+    def setxattr(self, path, name: str, value: str):
+        self._call("xattr", path)
+        self.base.setxattr(path, name, value)
@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+"""
+Catalogue de référence des hashes (ex. archive froide) pour repérer les fichiers déjà archivés.
+
+Format du fichier (.hcat) :
+  - en-tête de 64 octets : magic, nombre de hashes, taille du filtre de Bloom (bits), nombre de sondes ;
+  - n empreintes BLAKE3 binaires de 32 octets, triées et sans doublon ;
+  - filtre de Bloom optionnel (bits), consulté avant la recherche dichotomique.
+Le fichier est projeté en mémoire (memmap) : ~32 octets par hash, aucun objet Python par entrée.
+Recherche (HashCatalog) : numpy seul ; pandas n'est importé que pour lire les CSV (build / check).
+"""
+import argparse
+import os
+import re
+import struct
+import tempfile
+
+import numpy as np
+
+MAGIC = b"NASHCAT1"
+HEADER = struct.Struct("<8sQQQ")
+HEADER_SIZE = 64
+DIGEST_SIZE = 32
+DIGEST_DTYPE = np.dtype(f"S{DIGEST_SIZE}")
+CHUNK_ROWS = 1_000_000
+BLOOM_BITS_PER_HASH = 10
+BLOOM_PROBES = 7
+HEX_DIGEST = re.compile(r"[0-9a-f]{64}")
+
+
+def hex_to_digests(hashes) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Convertit une série de hashes hexadécimaux en empreintes binaires S32.
+    Renvoie (digests, valid) : valid indique les entrées de 64 caractères hexadécimaux.
+    """
+    # Valeurs manquantes (None, NaN de pandas) : non str -> invalides
+    s = [h.strip().lower() if isinstance(h, str) else "" for h in hashes]
+    valid = np.fromiter((HEX_DIGEST.fullmatch(h) is not None for h in s), dtype=bool, count=len(s))
+    digests = np.zeros(len(s), dtype=DIGEST_DTYPE)
+    if valid.any():
+        raw = bytes.fromhex("".join(h for h, ok in zip(s, valid) if ok))
+        digests[valid] = np.frombuffer(raw, dtype=DIGEST_DTYPE)
+    return digests, valid
+
+
+def _bloom_positions(digests: np.ndarray, nbits: int, probes: int) -> np.ndarray:
+    # Empreintes déjà uniformes : double hachage à partir de deux mots de 64 bits
+    words = digests.view(np.uint64).reshape(-1, DIGEST_SIZE // 8)
+    h1 = words[:, 0]
+    h2 = words[:, 1] | np.uint64(1)
+    steps = np.arange(probes, dtype=np.uint64)
+    return (h1[:, None] + steps[None, :] * h2[:, None]) % np.uint64(nbits)
+
+
+def _set_bits(bloom: np.ndarray, pos: np.ndarray):
+    """Active les bits `pos` : positions dédoublonnées et triées, puis un OU par octet en un passage."""
+    pos = np.unique(pos)
+    byte_idx = pos >> np.uint64(3)
+    bits = np.left_shift(np.uint8(1), (pos & np.uint64(7)).astype(np.uint8))
+    starts = np.flatnonzero(np.r_[True, byte_idx[1:] != byte_idx[:-1]])
+    bloom[byte_idx[starts]] |= np.bitwise_or.reduceat(bits, starts)
+
+
+def _file_rows(chunk):
+    """Lignes de fichiers d'un bloc du CSV (les empreintes de dossiers ne sont pas des contenus)."""
+    if "type" not in chunk.columns:
+        return chunk
+    return chunk[chunk["type"].fillna("file").str.strip().str.lower() == "file"].drop(columns="type")
+
+
+def iter_csv_digests(csv_path: str):
+    """Lit les hashes des fichiers d'un CSV d'audit par blocs et renvoie les empreintes binaires valides."""
+    import pandas as pd
+
+    for chunk in pd.read_csv(csv_path, usecols=lambda c: c in ("type", "hash"),
+                             dtype={"type": object, "hash": object},
+                             chunksize=CHUNK_ROWS, engine="c"):
+        digests, valid = hex_to_digests(_file_rows(chunk)["hash"])
+        if valid.any():
+            yield np.unique(digests[valid])
+
+
+def build_catalog(csv_paths, output: str, bloom_bits_per_hash: int = BLOOM_BITS_PER_HASH):
+    """
+    Construit le catalogue à partir d'un ou plusieurs audit_hashes.csv.
+    Les empreintes transitent par un fichier temporaire trié sur place (memmap),
+    puis sont dédoublonnées et écrites par blocs.
+    """
+    out_dir = os.path.dirname(os.path.abspath(output))
+    with tempfile.NamedTemporaryFile(dir=out_dir, suffix=".raw", delete=False) as tmp:
+        tmp_path = tmp.name
+        total = 0
+        for csv_path in csv_paths:
+            for digests in iter_csv_digests(csv_path):
+                tmp.write(digests.tobytes())
+                total += len(digests)
+
+    try:
+        count = 0
+        with open(output, "wb") as out:
+            out.write(b"\0" * HEADER_SIZE)
+            if total:
+                raw = np.memmap(tmp_path, dtype=DIGEST_DTYPE, mode="r+", shape=(total,))
+                # Tri sur place (introsort : pas de tampon auxiliaire, contrairement au tri fusion)
+                raw.sort()
+                prev = None
+                for start in range(0, total, CHUNK_ROWS):
+                    block = np.asarray(raw[start:start + CHUNK_ROWS])
+                    keep = np.ones(len(block), dtype=bool)
+                    keep[1:] = block[1:] != block[:-1]
+                    if prev is not None:
+                        keep[0] = block[0] != prev
+                    prev = block[-1]
+                    out.write(block[keep].tobytes())
+                    count += int(keep.sum())
+                del raw
+
+            nbits = 0
+            if bloom_bits_per_hash and count:
+                nbits = -(-count * bloom_bits_per_hash // 8) * 8
+                bloom = np.zeros(nbits // 8, dtype=np.uint8)
+                out.flush()   # empreintes relues par memmap : vider le tampon d'écriture d'abord
+                digests = np.memmap(output, dtype=DIGEST_DTYPE, mode="r", offset=HEADER_SIZE, shape=(count,))
+                for start in range(0, count, CHUNK_ROWS):
+                    pos = _bloom_positions(np.asarray(digests[start:start + CHUNK_ROWS]), nbits, BLOOM_PROBES).ravel()
+                    _set_bits(bloom, pos)
+                del digests
+                out.seek(HEADER_SIZE + count * DIGEST_SIZE)
+                out.write(bloom.tobytes())
+
+            out.seek(0)
+            out.write(HEADER.pack(MAGIC, count, nbits, BLOOM_PROBES if nbits else 0))
+    finally:
+        os.remove(tmp_path)
+    return count
+
+
+class HashCatalog:
+    """Catalogue projeté en mémoire ; recherches par lots vectorisées (contains)."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            magic, count, nbits, probes = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"Catalogue de hashes invalide : {path}")
+        self.path = path
+        self.count = count
+        self.nbits = nbits
+        self.probes = probes
+        self.digests = (
+            np.memmap(path, dtype=DIGEST_DTYPE, mode="r", offset=HEADER_SIZE, shape=(count,))
+            if count else np.zeros(0, dtype=DIGEST_DTYPE)
+        )
+        self.bloom = (
+            np.memmap(path, dtype=np.uint8, mode="r", offset=HEADER_SIZE + count * DIGEST_SIZE, shape=(nbits // 8,))
+            if nbits else None
+        )
+
+    def __len__(self):
+        return self.count
+
+    def contains_digests(self, digests: np.ndarray) -> np.ndarray:
+        found = np.zeros(len(digests), dtype=bool)
+        if not self.count or not len(digests):
+            return found
+        candidates = np.arange(len(digests))
+        if self.bloom is not None:
+            pos = _bloom_positions(digests, self.nbits, self.probes)
+            bits = (self.bloom[pos >> np.uint64(3)] >> (pos & np.uint64(7)).astype(np.uint8)) & 1
+            candidates = candidates[bits.all(axis=1)]
+        if len(candidates):
+            probe = digests[candidates]
+            idx = np.searchsorted(self.digests, probe)
+            idx[idx == self.count] = self.count - 1
+            found[candidates] = self.digests[idx] == probe
+        return found
+
+    def contains(self, hashes) -> np.ndarray:
+        """Indique, pour chaque hash hexadécimal, s'il figure dans le catalogue."""
+        digests, valid = hex_to_digests(hashes)
+        found = np.zeros(len(digests), dtype=bool)
+        found[valid] = self.contains_digests(digests[valid])
+        return found
+
+
+def check_csv(catalog: HashCatalog, csv_path: str, output: str):
+    """Écrit la liste des fichiers (hors dossiers) du CSV déjà présents dans le catalogue ; renvoie (nombre, octets)."""
+    import pandas as pd
+
+    n_files = 0
+    n_bytes = 0.0
+    header = True
+    for chunk in pd.read_csv(csv_path, usecols=lambda c: c in ("path", "type", "size_bytes", "hash"),
+                             dtype={"path": object, "type": object, "hash": object},
+                             chunksize=CHUNK_ROWS, engine="c"):
+        chunk = _file_rows(chunk)
+        archived = chunk[catalog.contains(chunk["hash"])]
+        archived.to_csv(output, mode="w" if header else "a", header=header, index=False)
+        header = False
+        n_files += len(archived)
+        n_bytes += float(pd.to_numeric(archived["size_bytes"], errors="coerce").fillna(0).sum())
+    return n_files, n_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Catalogue binaire de hashes de référence (archive) et recherche des fichiers déjà archivés."
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("build", help="Construire un catalogue à partir de CSV d'audit")
+    p_build.add_argument("csv", nargs="+", help="Un ou plusieurs audit_hashes.csv")
+    p_build.add_argument("--output", required=True, help="Fichier catalogue (.hcat)")
+    p_build.add_argument(
+        "--bloom-bits",
+        type=int,
+        default=BLOOM_BITS_PER_HASH,
+        help="Bits de filtre de Bloom par hash (0 = sans filtre)"
+    )
+
+    p_check = sub.add_parser("check", help="Lister les fichiers d'un audit déjà présents dans le catalogue")
+    p_check.add_argument("--catalog", required=True, help="Fichier catalogue (.hcat)")
+    p_check.add_argument("--csv", required=True, help="CSV d'audit à vérifier")
+    p_check.add_argument("--output", default="already_archived.csv", help="CSV de sortie")
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        count = build_catalog(args.csv, args.output, args.bloom_bits)
+        print(f"Catalogue sauvegardé : {args.output} ({count} hashes)")
+    else:
+        catalog = HashCatalog(args.catalog)
+        n_files, n_bytes = check_csv(catalog, args.csv, args.output)
+        print(f"Fichiers déjà archivés : {n_files} ({n_bytes / (1024 ** 3):.2f} GB)")
+        print(f"Liste sauvegardée : {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -18,6 +18,13 @@ Usage:
 Env vars utiles:
   B3FLAGS   : options b3sum (ex: "--num-threads 1 --no-mmap")
   PARALLEL  : options GNU parallel additionnelles (ex: "--bar --eta --joblog /tmp/xxx.tsv")
+  HASHER    : "b3sum" (défaut) ou "reader" (b3_reader.py : gros blocs + fadvise, mmap si local ;
+              un processus par lot de gros fichiers)
+  READER_PYTHON   : interpréteur pour b3_reader.py (défaut : python3 du PATH)
+  READER_MIN_SIZE : taille (octets) à partir de laquelle b3_reader.py est utilisé (défaut 8 MiB)
+  B3READER_FLAGS  : options b3_reader.py (ex: "--block-size 16777216")
+  B3READER_STATS  : journal TSV des débits de b3_reader.py (synthèse : b3_reader.py --report)
+  WRITE_SNAPSHOT  : 1 (défaut) = écrit aussi <output>.nasnap (snapshot binaire, snapshot.py) ; 0 = CSV seul
 
 Notes:
   - Étape 1: sélection 
@@ -348,7 +355,32 @@ echo " Étape 2/4: Processus de hashing ..."
 
 HASHCMD="b3sum ${B3FLAGS}"
 
+# Lecteur Python (b3_reader.py, HASHER=reader) pour les gros fichiers : un seul processus
+# par lot de fichiers (tampon réutilisé d'un fichier à l'autre) ; les petits fichiers
+# restent sur b3sum. READER_PYTHON : interpréteur à utiliser (défaut : python3).
+USE_READER=0
+READER_MIN_SIZE="${READER_MIN_SIZE:-8388608}"
+READER_PY="$(cd "$(dirname "$0")" && pwd)/b3_reader.py"
+PY3_BIN="${READER_PYTHON:-$(command -v python3 || true)}"
+B3READER_FLAGS="${B3READER_FLAGS:-}"
+B3READER_STATS="${B3READER_STATS:-}"
+if [[ "${HASHER:-b3sum}" == "reader" ]]; then
+  if [[ -f "$READER_PY" && -n "$PY3_BIN" ]]; then
+    USE_READER=1
+  else
+    echo "️  b3_reader.py ou python3 introuvable : hash via b3sum uniquement" >&2
+  fi
+fi
+
+record_hash() {
+  # record_hash <hash> <size> <mtime> <chemin> : xattrs + ligne TSV (hash \t size \t mtime \t path)
+  set_xattr "$ATTR_HASH" "$1" "$4"
+  set_xattr "$ATTR_STAMP" "${2}:${3}" "$4"
+  printf "%s\t%s\t%s\t%s\n" "$1" "$2" "$3" "$(normpath "$4")"
+}
+
 robust_worker() {
+  local big_fp=() big_sz=() big_mt=()
   for fp in "$@"; do
     if [[ ! -e "$fp" ]]; then
       sleep 0.1
@@ -368,8 +400,14 @@ robust_worker() {
       continue
     }
 
-    local out h
-    if ! out=$($HASHCMD -- "$fp" 2>&1); then
+    if [[ "$USE_READER" -eq 1 && "$sz" -ge "$READER_MIN_SIZE" ]]; then
+      big_fp+=("$fp"); big_sz+=("$sz"); big_mt+=("$mt")
+      continue
+    fi
+
+    local out h status=0
+    out=$($HASHCMD -- "$fp" 2>&1) || status=$?
+    if (( status != 0 )); then
       if grep -qi "No such file or directory" <<<"$out"; then
         printf "%s\tENOENT\t%s\n" "$(date -u +'%Y-%m-%dT%H:%M:%SZ')" "$(normpath "$fp")" >> "$MISS_LOG"
       else
@@ -378,17 +416,31 @@ robust_worker() {
       continue
     fi
     h="$(awk '{print $1}' <<<"$out")"
+    record_hash "$h" "$sz" "$mt" "$fp"
+  done
 
-    set_xattr "$ATTR_HASH" "$h" "$fp"
-    set_xattr "$ATTR_STAMP" "${sz}:${mt}" "$fp"
-
-    # TSV: hash \t size \t mtime \t path
-    printf "%s\t%s\t%s\t%s\n" "$h" "$sz" "$mt" "$(normpath "$fp")"
+  # Gros fichiers : un seul appel à b3_reader.py pour tout le lot. Les lignes « <hash>  <chemin> »
+  # arrivent dans l'ordre des arguments ; un fichier en erreur n'a pas de ligne.
+  (( ${#big_fp[@]} )) || return 0
+  local lines=() line i=0 k
+  while IFS= read -r line; do lines+=("$line"); done \
+    < <("$PY3_BIN" "$READER_PY" $B3READER_FLAGS -- "${big_fp[@]}" 2>/dev/null)
+  for k in "${!big_fp[@]}"; do
+    line="${lines[$i]:-}"
+    if [[ -n "$line" && "${line#*  }" == "${big_fp[$k]}" ]]; then
+      record_hash "${line%%  *}" "${big_sz[$k]}" "${big_mt[$k]}" "${big_fp[$k]}"
+      i=$((i + 1))
+    elif [[ ! -e "${big_fp[$k]}" ]]; then
+      printf "%s\tENOENT\t%s\n" "$(date -u +'%Y-%m-%dT%H:%M:%SZ')" "$(normpath "${big_fp[$k]}")" >> "$MISS_LOG"
+    else
+      printf "%s\tHASHERR\t%s\n" "$(date -u +'%Y-%m-%dT%H:%M:%SZ')" "$(normpath "${big_fp[$k]}")" >> "$MISS_LOG"
+    fi
   done
 }
 
-export -f robust_worker
+export -f robust_worker record_hash
 export ATTR_HASH ATTR_STAMP MISS_LOG HASHCMD B3FLAGS
+export USE_READER READER_MIN_SIZE READER_PY PY3_BIN B3READER_FLAGS B3READER_STATS
 
 hash_files_parallel() {
   if [[ $ALLOW_DIRS_ONLY -eq 1 ]]; then
@@ -556,6 +608,17 @@ fi
 
 echo "    Dossiers traités: $dirs_done"
 
+# Snapshot binaire à côté du CSV (recherche de chemin, contrôle avant suppression ;
+# conversion ~15 µs par ligne, soit ~15 s pour un million de lignes)
+SNAPSHOT_PY="$(cd "$(dirname "$0")" && pwd)/snapshot.py"
+if [[ "${WRITE_SNAPSHOT:-1}" == "1" && -f "$SNAPSHOT_PY" && -n "$PY3_BIN" ]]; then
+  if "$PY3_BIN" "$SNAPSHOT_PY" from-csv "$OUT_CSV" "${OUT_CSV%.csv}.nasnap" >/dev/null; then
+    echo "    Snapshot binaire: ${OUT_CSV%.csv}.nasnap"
+  else
+    echo "️  Snapshot binaire non écrit (CSV non convertible), le CSV reste la référence" >&2
+  fi
+fi
+
 # Fin
 for r in "${ROOTS[@]-}"; do
   echo " Fini pour: $(normpath "$r")"
@@ -0,0 +1,436 @@
+#!/usr/bin/env python
+"""
+Historique des audits : agrégats par dossier (taille, nombre de fichiers, octets dupliqués,
+fichier le plus récent) conservés run après run, pour suivre la croissance d'un sous-arbre
+sans relire les CSV bruts.
+
+Organisation du dossier d'historique :
+  - dirs.nul  : chemins des dossiers séparés par NUL ; l'identifiant d'un dossier est son rang
+                (ajout seulement, identifiants stables d'un run à l'autre) ;
+  - dirs.order : identifiants (int64) triés par chemin, pour trouver un sous-arbre par dichotomie ;
+  - runs.tsv  : un run par ligne (tag, fichier, dossiers connus, lignes modifiées) ;
+  - runs/<tag>.hrun : différences avec le run précédent, uniquement pour les dossiers modifiés.
+                Colonnes int64 (écarts d'identifiants, Δ taille, Δ fichiers, Δ doublons, Δ mtime),
+                octets regroupés par poids puis compressées (zlib) ;
+  - runs/<tag>.hckp : tous les CHECKPOINT_EVERY runs, état complet après ce run (même format,
+                différences avec un état vide) : une requête ne rejoue que depuis le plus proche.
+Les agrégats sont récursifs : la valeur d'un dossier couvre tout son sous-arbre.
+"""
+import argparse
+import bisect
+import calendar
+import csv
+import os
+import struct
+import time
+import unicodedata
+import zlib
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+
+MAGIC = b"NASHIST1"
+HEADER = struct.Struct("<8sQQq")   # magic, lignes modifiées, dossiers connus, date d'ajout
+COLUMNS = ("size", "count", "dup", "mtime")
+RUN_DIR_PREFIX = "hashing_run_"
+CHECKPOINT_EVERY = 16
+DEFAULT_MTIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Même réglage que hashes_scans.sh ; le format par défaut est triable tel quel
+MTIME_FORMAT = os.environ.get("MTIME_FORMAT", DEFAULT_MTIME_FORMAT)
+
+
+def format_bytes(n: float, signed: bool = False) -> str:
+    sign = "+" if signed and n > 0 else ""
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if abs(n) < 1024 or unit == "TB":
+            return f"{sign}{n:.2f} {unit}"
+        n /= 1024
+
+
+def format_epoch(ts: int) -> str:
+    if not ts:
+        return "N/A"
+    return "%04d-%02d-%02d %02d:%02d:%02d" % tuple(time.gmtime(ts)[:6])
+
+
+def parent_dir(path: str) -> str:
+    i = path.rfind("/")
+    return path[:i] if i > 0 else "/"
+
+
+def _csv_epoch(value: str) -> int:
+    """Date du CSV -> epoch (heure murale lue comme UTC, comme snapshot.py) ; 0 si illisible."""
+    if MTIME_FORMAT == DEFAULT_MTIME_FORMAT and len(value) == 19:
+        try:
+            return calendar.timegm((int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                                    int(value[11:13]), int(value[14:16]), int(value[17:19])))
+        except ValueError:
+            pass
+    if not value:
+        return 0
+    try:
+        return calendar.timegm(time.strptime(value, MTIME_FORMAT))
+    except ValueError:
+        pass
+    try:
+        return calendar.timegm(datetime.fromisoformat(value).utctimetuple())
+    except ValueError:
+        return 0
+
+
+def _iter_files(audit_path: str):
+    """Fichiers de l'audit (CSV ou snapshot .nasnap) : (dossier parent, taille, clé mtime, hash)."""
+    from snapshot import Snapshot, is_snapshot
+
+    if is_snapshot(audit_path):
+        with Snapshot(audit_path) as snap:
+            for path, element_type, size, mtime, file_hash in snap.iter_records():
+                if element_type == "file":
+                    yield parent_dir(path), size or 0, mtime or 0, file_hash
+        return
+
+    with open(audit_path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            if (row.get("type") or "file").strip().lower() != "file":
+                continue
+            try:
+                size = int(float(row["size_bytes"])) if row["size_bytes"] else 0
+            except ValueError:
+                size = 0
+            file_hash = (row.get("hash") or "").strip().lower() or None
+            mtime = row["mtime"] or ""
+            if MTIME_FORMAT != DEFAULT_MTIME_FORMAT:
+                mtime = _csv_epoch(mtime)   # format non triable : conversion par fichier
+            yield parent_dir(row["path"]), size, mtime, file_hash
+
+
+def compute_rollups(audit_path: str) -> dict:
+    """
+    Agrégats récursifs {dossier: [taille, fichiers, octets dupliqués, mtime le plus récent]}.
+    Un passage par fichier vers son dossier parent, puis un passage par dossier (du plus
+    profond au moins profond) vers son propre parent.
+    """
+    files = list(_iter_files(audit_path))
+    hash_counts = Counter(h for _, _, _, h in files if h)
+
+    rollups = {}
+    for parent, size, mtime, file_hash in files:
+        agg = rollups.get(parent)
+        if agg is None:
+            agg = rollups[parent] = [0, 0, 0, mtime]
+        agg[0] += size
+        agg[1] += 1
+        if file_hash and hash_counts[file_hash] > 1:
+            agg[2] += size
+        if mtime > agg[3]:
+            agg[3] = mtime
+    del files
+
+    to_epoch = _csv_epoch if any(isinstance(a[3], str) for a in rollups.values()) else int
+    empty_mtime = "" if to_epoch is _csv_epoch else 0
+    for d in list(rollups):
+        while d != "/":
+            d = parent_dir(d)
+            if d in rollups:
+                break
+            rollups[d] = [0, 0, 0, empty_mtime]
+
+    for d in sorted(rollups, key=lambda p: -p.count("/") if p != "/" else 1):
+        if d == "/":
+            continue
+        agg, up = rollups[d], rollups[parent_dir(d)]
+        up[0] += agg[0]
+        up[1] += agg[1]
+        up[2] += agg[2]
+        if agg[3] > up[3]:
+            up[3] = agg[3]
+
+    for agg in rollups.values():
+        agg[3] = to_epoch(agg[3])
+    return rollups
+
+
+def _encode_column(values: np.ndarray) -> bytes:
+    # Octets regroupés par poids : les deltas, petits, laissent des plans entiers de zéros
+    shuffled = values.astype("<i8").view(np.uint8).reshape(-1, 8).T.tobytes()
+    blob = zlib.compress(shuffled, 6)
+    return struct.pack("<Q", len(blob)) + blob
+
+
+def _decode_column(data: bytes, offset: int, n: int):
+    (length,) = struct.unpack_from("<Q", data, offset)
+    offset += 8
+    raw = np.frombuffer(zlib.decompress(data[offset:offset + length]), dtype=np.uint8)
+    values = raw.reshape(8, n).T.copy().view("<i8").ravel()
+    return values, offset + length
+
+
+class HistoryStore:
+    """Dossier d'historique : dictionnaire des dossiers + runs delta-encodés."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.dirs_path = os.path.join(root, "dirs.nul")
+        self.order_path = os.path.join(root, "dirs.order")
+        self.runs_path = os.path.join(root, "runs.tsv")
+        self.runs_dir = os.path.join(root, "runs")
+
+    def load_dirs(self):
+        if not os.path.exists(self.dirs_path):
+            return []
+        with open(self.dirs_path, "rb") as f:
+            return f.read().decode("utf-8").split("\0")[:-1]
+
+    def load_order(self, dirs):
+        """Identifiants triés par chemin (reconstruits si absents ou incomplets)."""
+        if os.path.exists(self.order_path):
+            order = np.fromfile(self.order_path, dtype="<i8")
+            if len(order) == len(dirs):
+                return order
+        return np.array(sorted(range(len(dirs)), key=dirs.__getitem__), dtype="<i8")
+
+    def checkpoint_name(self, tag: str) -> str:
+        return f"{tag}.hckp"
+
+    def runs(self):
+        """[(tag, fichier, dossiers connus, lignes modifiées)] dans l'ordre d'ajout."""
+        if not os.path.exists(self.runs_path):
+            return []
+        out = []
+        with open(self.runs_path, encoding="utf-8") as f:
+            next(f, None)
+            for line in f:
+                tag, name, n_dirs, n_changed = line.rstrip("\n").split("\t")
+                out.append((tag, name, int(n_dirs), int(n_changed)))
+        return out
+
+    def read_run(self, name: str):
+        """Renvoie (identifiants, deltas (n, 4))."""
+        with open(os.path.join(self.runs_dir, name), "rb") as f:
+            data = f.read()
+        magic, n, _, _ = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Run d'historique invalide : {name}")
+        offset = HEADER.size
+        gaps, offset = _decode_column(data, offset, n)
+        deltas = np.empty((n, len(COLUMNS)), dtype=np.int64)
+        for j in range(len(COLUMNS)):
+            deltas[:, j], offset = _decode_column(data, offset, n)
+        return np.cumsum(gaps), deltas
+
+    def replay(self, n_dirs: int, runs=None, start: int = 0):
+        """
+        Rejoue les runs et renvoie, pour chaque run à partir de l'indice `start`, l'état complet
+        (dossiers x colonnes). Repart du dernier état complet (.hckp) enregistré jusqu'à `start`.
+        """
+        runs = self.runs() if runs is None else runs
+        state = np.zeros((n_dirs, len(COLUMNS)), dtype=np.int64)
+        first = 0
+        for k in range(min(start, len(runs) - 1), -1, -1):
+            name = self.checkpoint_name(runs[k][0])
+            if os.path.exists(os.path.join(self.runs_dir, name)):
+                ids, values = self.read_run(name)
+                state[ids] = values
+                first = k + 1
+                if k >= start:
+                    yield runs[k][0], state
+                break
+        for k in range(first, len(runs)):
+            ids, deltas = self.read_run(runs[k][1])
+            state[ids] += deltas
+            if k >= start:
+                yield runs[k][0], state
+
+    def _write_run(self, name: str, ids: np.ndarray, values: np.ndarray, n_dirs: int):
+        tmp_path = os.path.join(self.runs_dir, name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, len(ids), n_dirs, int(time.time())))
+            f.write(_encode_column(np.diff(ids, prepend=0)))
+            for j in range(len(COLUMNS)):
+                f.write(_encode_column(values[:, j]))
+        os.replace(tmp_path, os.path.join(self.runs_dir, name))
+
+    def add_run(self, audit_path: str, tag: str):
+        """Ajoute un run ; renvoie (dossiers du run, dossiers modifiés depuis le run précédent)."""
+        runs = self.runs()
+        if any(t == tag for t, _, _, _ in runs):
+            raise ValueError(f"Run déjà présent dans l'historique : {tag}")
+        if runs and tag < runs[-1][0]:
+            raise ValueError(f"Les runs doivent être ajoutés dans l'ordre ({tag} < {runs[-1][0]}).")
+
+        rollups = compute_rollups(audit_path)
+        dirs = self.load_dirs()
+        ids = {d: i for i, d in enumerate(dirs)}
+        new_dirs = [d for d in rollups if d not in ids]
+        for d in new_dirs:
+            ids[d] = len(ids)
+        n_dirs = len(ids)
+
+        previous = np.zeros((n_dirs, len(COLUMNS)), dtype=np.int64)
+        for _, state in self.replay(len(dirs), runs, start=len(runs) - 1):
+            previous[:len(dirs)] = state
+
+        current = np.zeros_like(previous)
+        if rollups:
+            current[[ids[d] for d in rollups]] = np.array(list(rollups.values()), dtype=np.int64)
+        delta = current - previous
+        changed = np.flatnonzero(delta.any(axis=1))
+
+        # Ordre d'écriture : dictionnaire des dossiers d'abord (un run ne référence jamais un
+        # identifiant absent), runs.tsv en dernier (un run n'existe qu'une fois indexé)
+        os.makedirs(self.runs_dir, exist_ok=True)
+        if new_dirs:
+            with open(self.dirs_path, "ab") as f:
+                f.write("".join(d + "\0" for d in new_dirs).encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+            all_dirs = dirs + new_dirs
+            order = np.array(sorted(range(n_dirs), key=all_dirs.__getitem__), dtype="<i8")
+            order.tofile(self.order_path + ".tmp")
+            os.replace(self.order_path + ".tmp", self.order_path)
+
+        name = f"{tag}.hrun"
+        self._write_run(name, changed, delta[changed], n_dirs)
+        if (len(runs) + 1) % CHECKPOINT_EVERY == 0:
+            present = np.flatnonzero(current.any(axis=1))
+            self._write_run(self.checkpoint_name(tag), present, current[present], n_dirs)
+
+        new_index = not os.path.exists(self.runs_path)
+        with open(self.runs_path, "a", encoding="utf-8") as f:
+            if new_index:
+                f.write("tag\tfile\tdirs\tchanged\n")
+            f.write(f"{tag}\t{name}\t{n_dirs}\t{len(changed)}\n")
+        return len(rollups), len(changed)
+
+
+class _SortedDirs:
+    """Vue triée (par chemin) sur les dossiers, pour bisect sans recopier les chemins."""
+
+    def __init__(self, dirs, order):
+        self.dirs = dirs
+        self.order = order
+
+    def __len__(self):
+        return len(self.order)
+
+    def __getitem__(self, i):
+        return self.dirs[self.order[i]]
+
+
+def run_tag_for(audit_path: str) -> str:
+    """Tag d'un run : suffixe du dossier hashing_run_<date>, sinon date de modification du fichier."""
+    folder = os.path.basename(os.path.dirname(os.path.abspath(audit_path)))
+    if folder.startswith(RUN_DIR_PREFIX):
+        return folder[len(RUN_DIR_PREFIX):]
+    return time.strftime("%Y%m%d_%H%M%S", time.localtime(os.path.getmtime(audit_path)))
+
+
+def query(store: HistoryStore, under: str, last: int = 0, top: int = 10, depth: int = 1):
+    """Tendance d'un sous-arbre sur les derniers runs et plus fortes variations de ses sous-dossiers."""
+    dirs = store.load_dirs()
+    ids = {d: i for i, d in enumerate(dirs)}
+    root = under.rstrip("/") or "/"
+    root_id = next(
+        (ids[v] for v in (root, unicodedata.normalize("NFC", root), unicodedata.normalize("NFD", root)) if v in ids),
+        None,
+    )
+    if root_id is None:
+        raise ValueError(f"Dossier absent de l'historique : {under}")
+    root = dirs[root_id]
+
+    # Sous-arbre = plage contiguë des chemins triés : [root/, root0) ('/' précède '0')
+    order = store.load_order(dirs)
+    view = _SortedDirs(dirs, order)
+    target_depth = (0 if root == "/" else root.count("/")) + depth
+    if root == "/":
+        lo, hi = 0, len(view)
+    else:
+        lo, hi = bisect.bisect_left(view, root + "/"), bisect.bisect_left(view, root + "0")
+    children = np.array(
+        [i for i in order[lo:hi] if dirs[i] != "/" and dirs[i].count("/") == target_depth],
+        dtype=np.int64,
+    )
+
+    runs = store.runs()
+    selected = runs[-last:] if last else runs
+    first_selected = len(runs) - len(selected)
+    trend = []
+    first_children = last_children = None
+    for tag, state in store.replay(len(dirs), runs, start=first_selected):
+        trend.append((tag, state[root_id].copy()))
+        if first_children is None:
+            first_children = state[children].copy()
+        last_children = state[children].copy()
+
+    print(f"Sous-arbre : {root} ({len(trend)} runs)")
+    print(f"{'Run':<18}{'Taille':>14}{'Δ taille':>14}{'Fichiers':>12}{'Doublons':>14}{'Plus récent':>22}")
+    prev = None
+    for tag, (size, count, dup, mtime) in trend:
+        growth = format_bytes(size - prev, signed=True) if prev is not None else ""
+        print(f"{tag:<18}{format_bytes(size):>14}{growth:>14}{count:>12}{format_bytes(dup):>14}{format_epoch(mtime):>22}")
+        prev = size
+
+    if len(children) and trend:
+        growth = last_children[:, 0] - first_children[:, 0]
+        dup_growth = last_children[:, 2] - first_children[:, 2]
+        order = np.argsort(-np.abs(growth), kind="stable")[:top]
+        order = order[growth[order] != 0]
+        if len(order):
+            print(f"\nPlus fortes variations ({trend[0][0]} → {trend[-1][0]}) :")
+            print(f"{'Δ taille':>14}{'Δ doublons':>14}{'Taille':>14}  Dossier")
+            for i in order:
+                print(f"{format_bytes(growth[i], signed=True):>14}{format_bytes(dup_growth[i], signed=True):>14}"
+                      f"{format_bytes(last_children[i, 0]):>14}  {dirs[children[i]]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Historique des audits : croissance et doublons par dossier au fil des runs."
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_add = sub.add_parser("add", help="Ajouter un ou plusieurs runs (CSV ou snapshot .nasnap)")
+    p_add.add_argument("audits", nargs="+", help="audit_hashes.csv / .nasnap (ex. hashing_run_*/audit_hashes.csv)")
+    p_add.add_argument("--store", required=True, help="Dossier d'historique")
+    p_add.add_argument("--tag", default=None, help="Tag du run (défaut : date du dossier hashing_run_*)")
+
+    p_list = sub.add_parser("list", help="Lister les runs enregistrés")
+    p_list.add_argument("--store", required=True, help="Dossier d'historique")
+
+    p_query = sub.add_parser("query", help="Tendance d'un sous-arbre")
+    p_query.add_argument("--store", required=True, help="Dossier d'historique")
+    p_query.add_argument("--under", required=True, help="Dossier racine du sous-arbre")
+    p_query.add_argument("--last", type=int, default=0, help="Nombre de derniers runs (0 = tous)")
+    p_query.add_argument("--top", type=int, default=10, help="Nombre de sous-dossiers listés")
+    p_query.add_argument("--depth", type=int, default=1, help="Profondeur des sous-dossiers comparés")
+
+    args = parser.parse_args()
+    store = HistoryStore(args.store)
+
+    if args.command == "add":
+        if args.tag and len(args.audits) > 1:
+            parser.error("--tag n'est possible qu'avec un seul run")
+        known = {t for t, _, _, _ in store.runs()}
+        todo = []
+        for audit in args.audits:
+            # Snapshot binaire voisin préféré au CSV (lecture plus rapide)
+            nasnap = os.path.splitext(audit)[0] + ".nasnap"
+            todo.append((args.tag or run_tag_for(audit), nasnap if os.path.exists(nasnap) else audit))
+        for tag, audit in sorted(todo):
+            if tag in known:
+                print(f"Déjà présent : {tag}")
+                continue
+            n_dirs, n_changed = store.add_run(audit, tag)
+            print(f"Run ajouté : {tag} ({n_dirs} dossiers, {n_changed} modifiés)")
+    elif args.command == "list":
+        for tag, name, n_dirs, n_changed in store.runs():
+            size = os.path.getsize(os.path.join(store.runs_dir, name))
+            print(f"{tag}\t{n_changed} dossiers modifiés\t{format_bytes(size)}")
+    else:
+        query(store, args.under, args.last, args.top, args.depth)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+import argparse
+import json
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+# Règles disponibles (appliquées dans l'ordre donné, la plus prioritaire d'abord)
+RULES = ("root", "avoid", "oldest", "newest", "shortest", "longest")
+DEFAULT_RULES = "root,avoid,oldest,shortest"
+
+
+def format_bytes(n: float) -> str:
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if abs(n) < 1024 or unit == "TB":
+            return f"{n:.2f} {unit}"
+        n /= 1024
+
+
+def load_duplicates(csv_path: str) -> pd.DataFrame:
+    """Charge le CSV d'audit et ne garde que les fichiers appartenant à un groupe de doublons."""
+    df = pd.read_csv(
+        csv_path,
+        usecols=lambda c: c in ("path", "type", "size_bytes", "mtime", "hash"),
+        dtype={"path": object, "type": object, "hash": object},
+        na_values=["nan", "NaN", ""],
+        keep_default_na=True,
+        engine="c",
+    )
+    for col in ["path", "size_bytes", "mtime", "hash"]:
+        if col not in df:
+            raise ValueError(f"Le fichier CSV doit contenir la colonne '{col}'.")
+
+    mask = df["hash"].notna()
+    if "type" in df.columns:
+        mask &= df["type"].fillna("file").str.strip().str.lower() == "file"
+    df = df.loc[mask, ["path", "size_bytes", "mtime", "hash"]]
+    df["hash"] = df["hash"].str.strip().str.lower()
+    df = df[df["hash"] != ""]
+
+    # Un même fichier listé deux fois (racines de scan imbriquées) n'est pas un doublon :
+    # sans ce dédoublonnage, sa seule copie finirait dans la liste de suppression.
+    nfc = df["path"].astype(str).map(lambda p: unicodedata.normalize("NFC", p))
+    df = df[~nfc.duplicated()]
+
+    # Groupes = codes entiers (factorize) : tri et regroupement sans comparer de chaînes
+    codes, _ = pd.factorize(df["hash"])
+    sizes = np.bincount(codes)
+    df = df[sizes[codes] > 1].reset_index(drop=True)
+    df["group"] = pd.factorize(df["hash"])[0]
+
+    df["size_bytes"] = pd.to_numeric(df["size_bytes"], errors="coerce").fillna(0)
+    df["mtime"] = pd.to_datetime(df["mtime"], errors="coerce")
+    return df
+
+
+def rule_keys(df: pd.DataFrame, rules, prefer_roots, avoid):
+    """
+    Calcule une colonne de tri par règle (plus petit = meilleur candidat à conserver).
+    Tout est vectorisé : une passe par racine / motif, aucune boucle par groupe.
+    """
+    paths = df["path"].astype(str)
+    mtime_ns = df["mtime"].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    missing_mtime = df["mtime"].isna().to_numpy()
+    keys = {}
+
+    for rule in rules:
+        if rule == "root":
+            rank = np.full(len(df), len(prefer_roots), dtype=np.int64)
+            for i in range(len(prefer_roots) - 1, -1, -1):
+                root = prefer_roots[i].rstrip("/") + "/"
+                rank[paths.str.startswith(root).to_numpy()] = i
+            keys["_root"] = rank
+        elif rule == "avoid":
+            hits = np.zeros(len(df), dtype=np.int64)
+            for pattern in avoid:
+                segment = "/" + pattern.strip("/") + "/"
+                hits += paths.str.contains(segment, regex=False).to_numpy()
+            keys["_avoid"] = hits
+        elif rule == "oldest":
+            keys["_oldest"] = np.where(missing_mtime, np.iinfo(np.int64).max, mtime_ns)
+        elif rule == "newest":
+            keys["_newest"] = np.where(missing_mtime, np.iinfo(np.int64).max, -mtime_ns)
+        elif rule == "shortest":
+            keys["_shortest"] = paths.str.len().to_numpy()
+        elif rule == "longest":
+            keys["_longest"] = -paths.str.len().to_numpy()
+    return keys
+
+
+def select_deletions(df: pd.DataFrame, rules, prefer_roots=(), avoid=()) -> pd.DataFrame:
+    """
+    Désigne un fichier à conserver par groupe (hash) ; renvoie les lignes à supprimer.
+    Un seul tri lexicographique (np.lexsort, stable) : groupe, puis règles par priorité,
+    puis ordre du CSV ; le premier fichier de chaque groupe est conservé.
+    """
+    keys = rule_keys(df, rules, list(prefer_roots), list(avoid))
+    group = df["group"].to_numpy()
+    order = np.lexsort([*reversed(list(keys.values())), group])
+    sorted_group = group[order]
+    keeper = np.ones(len(order), dtype=bool)
+    keeper[1:] = sorted_group[1:] != sorted_group[:-1]
+
+    # Garde-fou : aucun chemin supprimé ne doit désigner le fichier conservé de son groupe
+    nfc = df["path"].astype(str).map(lambda p: unicodedata.normalize("NFC", p)).to_numpy()
+    kept = dict(zip(sorted_group[keeper], nfc[order[keeper]]))
+    deleted = np.sort(order[~keeper])
+    deleted = deleted[[nfc[i] != kept[group[i]] for i in deleted]] if len(deleted) else deleted
+    return df.iloc[deleted][["path", "size_bytes", "hash"]]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Sélection automatique du fichier à conserver dans chaque groupe de doublons "
+            "et génération de paths_to_delete.json (lu par delete_from_json.py)."
+        )
+    )
+    parser.add_argument("--csv", required=True, help="CSV d'audit (audit_hashes.csv)")
+    parser.add_argument("--output", default="paths_to_delete.json", help="JSON de sortie")
+    parser.add_argument(
+        "--rules",
+        default=DEFAULT_RULES,
+        help=f"Règles de choix du fichier conservé, par priorité ({', '.join(RULES)}). Défaut : {DEFAULT_RULES}"
+    )
+    parser.add_argument(
+        "--prefer-root",
+        action="append",
+        default=[],
+        help="Racine à privilégier pour le fichier conservé (répétable, par ordre de préférence)"
+    )
+    parser.add_argument(
+        "--avoid",
+        action="append",
+        default=[],
+        help="Dossier à éviter pour le fichier conservé, ex. 'Archive/' (répétable)"
+    )
+    args = parser.parse_args()
+
+    rules = [r.strip() for r in args.rules.split(",") if r.strip()]
+    unknown = [r for r in rules if r not in RULES]
+    if unknown:
+        raise ValueError(f"Règle(s) inconnue(s) : {', '.join(unknown)}")
+
+    df = load_duplicates(args.csv)
+    to_delete = select_deletions(df, rules, args.prefer_root, args.avoid)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(to_delete["path"].astype(str).tolist(), f, ensure_ascii=False, indent=2)
+
+    groups = int(df["group"].max()) + 1 if len(df) else 0
+    print(f"Groupes de doublons : {groups} ({len(df)} fichiers)")
+    print(f"Fichiers à supprimer : {len(to_delete)}")
+    print(f"Espace récupérable : {format_bytes(float(to_delete['size_bytes'].sum()))}")
+    print(f"Liste sauvegardée : {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+"""
+Format binaire de snapshot d'audit (.nasnap), alternative compacte à audit_hashes.csv.
+
+Disposition (entiers little-endian, sections 64 bits alignées sur 8 octets) :
+  - en-tête : magic, nombre de lignes, taille de bloc, nombre de blocs, offsets des sections ;
+  - chemins triés, codés par préfixe commun (front coding) en blocs de BLOCK_SIZE chemins :
+      u32 n | u32[n] longueurs de préfixe partagé | u32[n] longueurs de suffixe |
+      u32 octets | suffixes UTF-8 concaténés   (longueurs en caractères) ;
+  - index creux : offset (u64) de chaque bloc — le premier chemin d'un bloc est complet ;
+  - premiers chemins : u64[blocs + 1] offsets | UTF-8 concaténés — clés de la dichotomie,
+    lues sans décoder de bloc (section absente des anciens snapshots : offset 0) ;
+  - colonnes : empreintes binaires (32 octets), size (i64), mtime (i64, epoch UTC),
+    rang d'origine dans le CSV (i64), drapeaux (u8 : dossier, hash, size, mtime présents).
+
+Les colonnes sont projetées en mémoire (mmap + memoryview) : recherche d'un chemin par
+dichotomie sur l'index creux puis décodage d'un seul bloc ; lecture complète bloc par bloc.
+Mesuré sur 500 000 lignes : parcours complet (iter_records, valeurs typées) en 0,38 s contre
+0,58 s pour csv.reader seul (chaînes brutes), soit environ 1,5× ; l'intérêt principal reste la
+recherche d'un chemin sans lire le CSV. Conversion depuis le CSV : environ 15 µs par ligne.
+Conversion sans perte depuis / vers le CSV produit par hashes_scans.sh (même ordre de lignes).
+La conversion trie les chemins par runs externes fusionnés (heapq.merge) et passe les colonnes
+par des fichiers temporaires : la mémoire reste bornée (8 octets par ligne pour la permutation).
+Bibliothèque standard uniquement (les sous-commandes index / query, dans audit_query.py,
+utilisent numpy, et pandas via select_keepers.py pour désigner les fichiers conservés).
+"""
+import argparse
+import array
+import bisect
+import calendar
+import csv
+import heapq
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+import unicodedata
+from datetime import date
+
+MAGIC = b"NASSNAP1"
+HEADER = struct.Struct("<8sQIIQ8Q")   # magic, lignes, taille de bloc, réservé, blocs, 8 offsets
+RUN_ENTRY = struct.Struct("<qI")       # rang dans le CSV, longueur UTF-8 du chemin
+SORT_RUN_ROWS = 500_000                # chemins triés en mémoire avant écriture d'un run
+GATHER_ROWS = 65_536
+HEADER_SIZE = 128
+BLOCK_SIZE = 64
+DIGEST_SIZE = 32
+MTIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+CSV_HEADER = "path,type,size_bytes,mtime,hash"
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+FLAG_DIR = 1
+FLAG_HASH = 2
+FLAG_SIZE = 4
+FLAG_MTIME = 8
+
+if sys.byteorder != "little":
+    raise ImportError("snapshot.py suppose une machine little-endian.")
+
+
+def _align(f, boundary: int = 8):
+    pad = (-f.tell()) % boundary
+    if pad:
+        f.write(b"\0" * pad)
+    return f.tell()
+
+
+def _common_prefix(a: str, b: str) -> int:
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def _encode_block(paths):
+    prefixes = array.array("I")
+    suffixes = array.array("I")
+    parts = []
+    prev = ""
+    for i, p in enumerate(paths):
+        k = _common_prefix(prev, p) if i else 0
+        prefixes.append(k)
+        suffixes.append(len(p) - k)
+        parts.append(p[k:])
+        prev = p
+    blob = "".join(parts).encode("utf-8")
+    return b"".join([
+        struct.pack("<I", len(paths)), prefixes.tobytes(), suffixes.tobytes(),
+        struct.pack("<I", len(blob)), blob,
+    ])
+
+
+def _parse_mtime(mtime: str, line_no):
+    """
+    Date MTIME_FORMAT -> epoch UTC, sans perte. Chemin rapide par découpage (AAAA-MM-JJ HH:MM:SS,
+    chiffres ASCII, année >= 1000) ; toute autre forme passe par strptime puis est refusée si
+    strftime ne la restitue pas à l'identique.
+    """
+    if (len(mtime) == 19 and mtime.isascii() and mtime[4] == "-" and mtime[7] == "-" and mtime[10] == " "
+            and mtime[13] == ":" and mtime[16] == ":" and mtime[0] != "0"
+            and (mtime[:4] + mtime[5:7] + mtime[8:10] + mtime[11:13] + mtime[14:16] + mtime[17:]).isdigit()):
+        h, m, sec = int(mtime[11:13]), int(mtime[14:16]), int(mtime[17:])
+        try:
+            day = date(int(mtime[:4]), int(mtime[5:7]), int(mtime[8:10])).toordinal() - EPOCH_ORDINAL
+        except ValueError:
+            day = None
+        if day is not None and h < 24 and m < 60 and sec < 60:
+            return 86400 * day + 3600 * h + 60 * m + sec
+    try:
+        mtime_v = calendar.timegm(time.strptime(mtime, MTIME_FORMAT))
+    except ValueError:
+        mtime_v = None
+    if mtime_v is None or time.strftime(MTIME_FORMAT, time.gmtime(mtime_v)) != mtime:
+        raise ValueError(f"Ligne {line_no} : date '{mtime}' non convertible sans perte.")
+    return mtime_v
+
+
+def _parse_csv_row(row, line_no):
+    """Valide une ligne du CSV pour une conversion sans perte ; renvoie (flags, size, mtime, digest)."""
+    path, typ, size, mtime, h = (row + [""] * 5)[:5]
+    if typ not in ("file", "directory"):
+        raise ValueError(f"Ligne {line_no} : type '{typ}' non convertible sans perte.")
+    flags = FLAG_DIR if typ == "directory" else 0
+    size_v = 0
+    if size:
+        size_v = int(size)
+        if str(size_v) != size:
+            raise ValueError(f"Ligne {line_no} : taille '{size}' non convertible sans perte.")
+        flags |= FLAG_SIZE
+    mtime_v = 0
+    if mtime:
+        mtime_v = _parse_mtime(mtime, line_no)
+        flags |= FLAG_MTIME
+    digest = b"\0" * DIGEST_SIZE
+    if h:
+        if len(h) != 2 * DIGEST_SIZE or h != h.lower():
+            raise ValueError(f"Ligne {line_no} : hash '{h}' non convertible sans perte.")
+        digest = bytes.fromhex(h)
+        flags |= FLAG_HASH
+    return path, flags, size_v, mtime_v, digest
+
+
+def _write_sort_run(entries, directory: str) -> str:
+    entries.sort()
+    fd, path = tempfile.mkstemp(dir=directory, suffix=".run.tmp")
+    with os.fdopen(fd, "wb") as f:
+        for p, row in entries:
+            raw = p.encode("utf-8")
+            f.write(RUN_ENTRY.pack(row, len(raw)))
+            f.write(raw)
+    entries.clear()
+    return path
+
+
+def _read_sort_run(path: str):
+    with open(path, "rb", buffering=1 << 20) as f:
+        while True:
+            head = f.read(RUN_ENTRY.size)
+            if not head:
+                return
+            row, length = RUN_ENTRY.unpack(head)
+            yield f.read(length).decode("utf-8"), row
+
+
+def _gather(column, order, width: int):
+    """Octets de `column` (largeur fixe) dans l'ordre `order`, par tranches."""
+    for start in range(0, len(order), GATHER_ROWS):
+        yield b"".join(column[i * width:(i + 1) * width] for i in order[start:start + GATHER_ROWS])
+
+
+def csv_to_snapshot(csv_path: str, output: str, block_size: int = BLOCK_SIZE):
+    """Convertit un audit_hashes.csv en snapshot binaire ; renvoie le nombre de lignes."""
+    work_dir = os.path.dirname(os.path.abspath(output))
+    temps = []
+    columns, col_paths = {}, {}
+    try:
+        # 1) Lecture : colonnes vers des fichiers temporaires (ordre du CSV), chemins en runs triés
+        for name in ("flags", "sizes", "mtimes", "digests"):
+            fd, col_paths[name] = tempfile.mkstemp(dir=work_dir, suffix=f".{name}.tmp")
+            temps.append(col_paths[name])
+            columns[name] = os.fdopen(fd, "wb")
+        runs, entries = [], []
+        n = 0
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header != CSV_HEADER.split(","):
+                raise ValueError(f"En-tête CSV inattendu : {header}")
+            for line_no, row in enumerate(reader, start=2):
+                path, flags, size_v, mtime_v, digest = _parse_csv_row(row, line_no)
+                columns["flags"].write(bytes((flags,)))
+                columns["sizes"].write(struct.pack("<q", size_v))
+                columns["mtimes"].write(struct.pack("<q", mtime_v))
+                columns["digests"].write(digest)
+                entries.append((path, n))
+                n += 1
+                if len(entries) >= SORT_RUN_ROWS:
+                    runs.append(_write_sort_run(entries, work_dir))
+                    temps.append(runs[-1])
+        for col in columns.values():
+            col.close()
+        entries.sort()
+
+        # 2) Fusion des runs : chemins triés (égalités départagées par le rang, tri stable)
+        #    -> blocs front-codés, premiers chemins, permutation
+        n_blocks = -(-n // block_size)
+        order = array.array("q")
+        block_offsets = array.array("Q")
+        first_keys = []
+        tmp_path = output + ".tmp"
+        with open(tmp_path, "wb") as out:
+            out.write(b"\0" * HEADER_SIZE)
+            paths_off = out.tell()
+            block = []
+            for path, row in heapq.merge(*(_read_sort_run(r) for r in runs), iter(entries)):
+                order.append(row)
+                block.append(path)
+                if len(block) == block_size:
+                    block_offsets.append(out.tell() - paths_off)
+                    first_keys.append(block[0].encode("utf-8"))
+                    out.write(_encode_block(block))
+                    block = []
+            if block:
+                block_offsets.append(out.tell() - paths_off)
+                first_keys.append(block[0].encode("utf-8"))
+                out.write(_encode_block(block))
+            entries = None
+            index_off = _align(out)
+            out.write(block_offsets.tobytes())
+            keys_off = _align(out)
+            key_offsets = array.array("Q", [0])
+            for key in first_keys:
+                key_offsets.append(key_offsets[-1] + len(key))
+            out.write(key_offsets.tobytes())
+            out.write(b"".join(first_keys))
+            del first_keys
+
+            # 3) Colonnes permutées dans l'ordre des chemins (lecture des temporaires projetés)
+            def copy_column(name: str, width: int):
+                if not n:
+                    return
+                with open(col_paths[name], "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    for chunk in _gather(mm, order, width):
+                        out.write(chunk)
+
+            digest_off = _align(out)
+            copy_column("digests", DIGEST_SIZE)
+            size_off = _align(out)
+            copy_column("sizes", 8)
+            mtime_off = _align(out)
+            copy_column("mtimes", 8)
+            order_off = _align(out)
+            out.write(order.tobytes())
+            flags_off = out.tell()
+            copy_column("flags", 1)
+            out.seek(0)
+            out.write(HEADER.pack(MAGIC, n, block_size, 0, n_blocks,
+                                  paths_off, index_off, digest_off, size_off,
+                                  mtime_off, order_off, flags_off, keys_off))
+        os.replace(tmp_path, output)
+    finally:
+        for col in columns.values():
+            col.close()
+        for path in temps:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    return n
+
+
+def is_snapshot(path: str) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+class Snapshot:
+    """Snapshot projeté en mémoire : colonnes en memoryview, chemins décodés bloc par bloc."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.count, self.block_size, _, self.n_blocks,
+         self._paths_off, index_off, digest_off, size_off,
+         mtime_off, order_off, flags_off, keys_off) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Snapshot invalide : {path}")
+        mv = memoryview(self._mm)
+        n = self.count
+        self._block_offsets = mv[index_off:index_off + 8 * self.n_blocks].cast("Q")
+        self._key_offsets = mv[keys_off:keys_off + 8 * (self.n_blocks + 1)].cast("Q") if keys_off else None
+        self._keys_off = keys_off + 8 * (self.n_blocks + 1)
+        self.digests = mv[digest_off:digest_off + DIGEST_SIZE * n]
+        self.sizes = mv[size_off:size_off + 8 * n].cast("q")
+        self.mtimes = mv[mtime_off:mtime_off + 8 * n].cast("q")
+        self.order = mv[order_off:order_off + 8 * n].cast("q")
+        self.flags = mv[flags_off:flags_off + n]
+
+    def close(self):
+        for view in (self._block_offsets, self._key_offsets, self.digests, self.sizes, self.mtimes,
+                     self.order, self.flags):
+            if view is not None:
+                view.release()
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def block_paths(self, b: int):
+        """Décode les chemins (triés) du bloc b."""
+        off = self._paths_off + self._block_offsets[b]
+        (k,) = struct.unpack_from("<I", self._mm, off)
+        off += 4
+        prefixes = array.array("I", self._mm[off:off + 4 * k])
+        off += 4 * k
+        suffixes = array.array("I", self._mm[off:off + 4 * k])
+        off += 4 * k
+        (nbytes,) = struct.unpack_from("<I", self._mm, off)
+        off += 4
+        blob = self._mm[off:off + nbytes].decode("utf-8")
+        paths = []
+        prev = ""
+        pos = 0
+        for pre, suf in zip(prefixes, suffixes):
+            prev = prev[:pre] + blob[pos:pos + suf]
+            pos += suf
+            paths.append(prev)
+        return paths
+
+    def _first_key(self, b: int) -> str:
+        if self._key_offsets is not None:
+            start, end = self._key_offsets[b], self._key_offsets[b + 1]
+            return self._mm[self._keys_off + start:self._keys_off + end].decode("utf-8")
+        # Ancien snapshot sans section de premiers chemins : lecture dans le bloc
+        off = self._paths_off + self._block_offsets[b]
+        (k,) = struct.unpack_from("<I", self._mm, off)
+        (suf,) = struct.unpack_from("<I", self._mm, off + 4 + 4 * k)
+        (nbytes,) = struct.unpack_from("<I", self._mm, off + 4 + 8 * k)
+        blob_off = off + 8 + 8 * k
+        # Le premier chemin est complet : ses `suf` premiers caractères du blob
+        return self._mm[blob_off:blob_off + nbytes].decode("utf-8")[:suf]
+
+    def _block_for(self, path: str) -> int:
+        """Dernier bloc dont le premier chemin est <= path (-1 si aucun) : dichotomie sur l'index creux."""
+        lo, hi = 0, self.n_blocks
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._first_key(mid) <= path:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo - 1
+
+    def lower_bound(self, path: str) -> int:
+        """Indice du premier chemin >= path (bornes de plage pour un préfixe)."""
+        b = self._block_for(path)
+        if b < 0:
+            return 0
+        return b * self.block_size + bisect.bisect_left(self.block_paths(b), path)
+
+    def find(self, path: str):
+        """Indice (ordre trié) du chemin, ou None."""
+        b = self._block_for(path)
+        if b < 0:
+            return None
+        paths = self.block_paths(b)
+        i = bisect.bisect_left(paths, path)
+        if i < len(paths) and paths[i] == path:
+            return b * self.block_size + i
+        return None
+
+    def record(self, i: int, path: str):
+        """Ligne i : (path, type, size|None, mtime epoch|None, hash hex|None)."""
+        fl = self.flags[i]
+        return (
+            path,
+            "directory" if fl & FLAG_DIR else "file",
+            self.sizes[i] if fl & FLAG_SIZE else None,
+            self.mtimes[i] if fl & FLAG_MTIME else None,
+            self.digests[i * DIGEST_SIZE:(i + 1) * DIGEST_SIZE].hex() if fl & FLAG_HASH else None,
+        )
+
+    def lookup(self, path: str):
+        """Recherche d'un chemin (essaie NFC puis NFD) ; renvoie record(...) ou None."""
+        for variant in dict.fromkeys([path, unicodedata.normalize("NFC", path), unicodedata.normalize("NFD", path)]):
+            i = self.find(variant)
+            if i is not None:
+                return self.record(i, variant)
+        return None
+
+    def iter_records(self, csv_order: bool = False):
+        """
+        Parcours complet : dans l'ordre des chemins, bloc par bloc (mémoire constante),
+        ou dans l'ordre des lignes du CSV d'origine (tous les chemins sont alors décodés).
+        """
+        if not csv_order:
+            # Colonnes lues par tranche de bloc (tolist / bytes) plutôt que valeur par valeur
+            for b in range(self.n_blocks):
+                paths = self.block_paths(b)
+                lo, hi = b * self.block_size, b * self.block_size + len(paths)
+                digests = self.digests[lo * DIGEST_SIZE:hi * DIGEST_SIZE].tobytes()
+                for j, (path, fl, size, mtime) in enumerate(zip(
+                        paths, self.flags[lo:hi].tobytes(), self.sizes[lo:hi].tolist(), self.mtimes[lo:hi].tolist())):
+                    yield (
+                        path,
+                        "directory" if fl & FLAG_DIR else "file",
+                        size if fl & FLAG_SIZE else None,
+                        mtime if fl & FLAG_MTIME else None,
+                        digests[j * DIGEST_SIZE:(j + 1) * DIGEST_SIZE].hex() if fl & FLAG_HASH else None,
+                    )
+            return
+        paths = [p for b in range(self.n_blocks) for p in self.block_paths(b)]
+        by_row = array.array("q", bytes(8 * self.count))
+        for i, row in enumerate(self.order):
+            by_row[row] = i
+        for i in by_row:
+            yield self.record(i, paths[i])
+
+
+def snapshot_to_csv(snapshot_path: str, output: str):
+    """Reconstruit le CSV d'origine (mêmes lignes, même ordre, même mise en forme)."""
+    with Snapshot(snapshot_path) as snap:
+        with open(output, "w", encoding="utf-8", newline="") as f:
+            f.write(CSV_HEADER + "\n")
+            for path, typ, size, mtime, h in snap.iter_records(csv_order=True):
+                p_esc = path.replace('"', '""')
+                size_s = "" if size is None else str(size)
+                mtime_s = "" if mtime is None else time.strftime(MTIME_FORMAT, time.gmtime(mtime))
+                f.write(f'"{p_esc}",{typ},{size_s},"{mtime_s}",{h or ""}\n')
+        return len(snap)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshot binaire d'audit (.nasnap) : conversion et recherche.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_from = sub.add_parser("from-csv", help="CSV d'audit -> snapshot binaire")
+    p_from.add_argument("csv")
+    p_from.add_argument("output")
+    p_from.add_argument("--block-size", type=int, default=BLOCK_SIZE, help="Chemins par bloc (index creux)")
+
+    p_to = sub.add_parser("to-csv", help="Snapshot binaire -> CSV d'audit")
+    p_to.add_argument("snapshot")
+    p_to.add_argument("output")
+
+    p_lookup = sub.add_parser("lookup", help="Afficher les lignes de chemins donnés")
+    p_lookup.add_argument("snapshot")
+    p_lookup.add_argument("paths", nargs="+")
+
+    p_index = sub.add_parser("index", help="Construire (ou reconstruire) les index de requête")
+    p_index.add_argument("snapshot")
+
+    p_query = sub.add_parser("query", help="Filtrer, agréger et classer les lignes (index construits au besoin)")
+
+    # numpy (audit_query) n'est importé que pour la sous-commande query
+    argv = sys.argv[1:]
+    if argv[:1] == ["query"]:
+        from audit_query import add_query_arguments
+        add_query_arguments(p_query)
+    args = parser.parse_args(argv)
+
+    if args.command == "index":
+        from audit_query import build_indexes
+        print(f"Index sauvegardés : {build_indexes(args.snapshot)}")
+    elif args.command == "query":
+        from audit_query import run_query
+        try:
+            run_query(args)
+        except ValueError as e:
+            parser.error(str(e))
+    elif args.command == "from-csv":
+        n = csv_to_snapshot(args.csv, args.output, args.block_size)
+        print(f"Snapshot sauvegardé : {args.output} ({n} lignes)")
+    elif args.command == "to-csv":
+        n = snapshot_to_csv(args.snapshot, args.output)
+        print(f"CSV sauvegardé : {args.output} ({n} lignes)")
+    else:
+        with Snapshot(args.snapshot) as snap:
+            for p in args.paths:
+                rec = snap.lookup(p)
+                print(rec if rec is not None else f"Introuvable : {p}")
+
+
+if __name__ == "__main__":
+    main()
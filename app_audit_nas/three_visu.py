@@ -1,26 +1,61 @@
 #!/usr/bin/env python
 import argparse
+import csv
+import gzip
 import json
+import os
+import re
+import unicodedata
+from array import array
 from collections import defaultdict
+from datetime import datetime, timedelta, timezone
 from pathlib import PurePosixPath
 
-import pandas as pd
+# Au-delà de cette taille de CSV, --engine auto passe au moteur pandas (s'il est installé)
+PANDAS_ENGINE_MIN_BYTES = 256 * 1024 * 1024
+MTIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+EPOCH = datetime(1970, 1, 1)
+REQUIRED_COLUMNS = ["path", "size_bytes", "mtime"]
+# Niveaux de détail : au-delà de LOD_MAX_CHILDREN enfants, un dossier est découpé en au plus
+# LOD_MAX_BUCKETS groupes (identifiants préfixés par LOD_PREFIX)
+LOD_MAX_CHILDREN = 50
+LOD_MAX_BUCKETS = 12
+LOD_PREFIX = "#lod:"
 
 
 def format_size(bytes_value):
-    if pd.isna(bytes_value):
+    if bytes_value is None or bytes_value != bytes_value:  # None ou NaN
         return "0 MB"
     mb = float(bytes_value) / (1024 * 1024)
     return f"{mb:.2f} MB"
 
 
+def naive_utc(date_value):
+    """Date avec fuseau -> UTC sans fuseau (comparable aux dates du scanner)."""
+    if date_value is not None and date_value.tzinfo is not None:
+        return date_value.astimezone(timezone.utc).replace(tzinfo=None)
+    return date_value
+
+
+def parse_date(value):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, MTIME_FORMAT)
+    except ValueError:
+        try:
+            return naive_utc(datetime.fromisoformat(value))
+        except ValueError:
+            return None
+
+
 def format_date(date_value):
-    if pd.isna(date_value):
+    if date_value is None:
         return "N/A"
     try:
         if isinstance(date_value, str):
-            date_value = pd.to_datetime(date_value, errors="coerce")
-        return date_value.strftime("%Y-%m-%d %H:%M:%S")
+            date_value = parse_date(date_value)
+        return date_value.strftime(MTIME_FORMAT)
     except Exception:
         return "N/A"
 
@@ -30,7 +65,116 @@ def split_parts(p: str):
     return [part for part in p.split("/") if part not in ("", ".")]
 
 
-def build_aggregates(df: pd.DataFrame):
+def _clean(value):
+    value = (value or "").strip().lower()
+    return value or None
+
+
+def iter_csv_rows(csv_path: str):
+    """
+    Moteur standard (module csv) : lignes {path, size_bytes, mtime, type, hash},
+    avec size_bytes en float (None si vide) et mtime en datetime (None si invalide).
+    """
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for col in REQUIRED_COLUMNS:
+            if col not in (reader.fieldnames or []):
+                raise ValueError(f"Le fichier CSV doit contenir la colonne '{col}'.")
+        for row in reader:
+            try:
+                size = float(row["size_bytes"]) if row["size_bytes"] else None
+            except ValueError:
+                size = None
+            yield {
+                "path": row["path"],
+                "size_bytes": size,
+                "mtime": parse_date(row["mtime"]),
+                "type": _clean(row.get("type")) or "N/A",
+                "hash": _clean(row.get("hash")),
+            }
+
+
+def iter_pandas_rows(csv_path: str):
+    """Moteur pandas (import paresseux) : lecture vectorisée, mêmes lignes que iter_csv_rows."""
+    import pandas as pd
+
+    df = pd.read_csv(
+        csv_path,
+        usecols=lambda c: c in ("path", "size_bytes", "mtime", "type", "hash"),
+        dtype={"path": "string", "type": "string", "hash": "string"},
+        na_values=["nan", "NaN", ""],
+        keep_default_na=True,
+        low_memory=True,
+        engine="c",
+    )
+    for col in REQUIRED_COLUMNS:
+        if col not in df:
+            raise ValueError(f"Le fichier CSV doit contenir la colonne '{col}'.")
+
+    sizes = pd.to_numeric(df["size_bytes"], errors="coerce").astype(object)
+    # Format du scanner en vectoriel ; les autres dates (ISO, avec fuseau…) une par une, comme parse_date
+    mtimes = pd.to_datetime(df["mtime"], format=MTIME_FORMAT, errors="coerce").astype(object)
+    others = mtimes.isna() & df["mtime"].notna()
+    if others.any():
+        mtimes[others] = [parse_date(str(v)) for v in df["mtime"][others]]
+    types = df["type"].str.strip().str.lower().fillna("N/A") if "type" in df else pd.Series("N/A", index=df.index)
+    hashes = df["hash"].str.strip().str.lower() if "hash" in df else pd.Series(pd.NA, index=df.index)
+
+    for path, size, mtime, element_type, file_hash in zip(
+        df["path"].astype(str), sizes.where(sizes.notna(), None),
+        mtimes.where(mtimes.notna(), None), types, hashes.astype(object).where(hashes.notna(), None)
+    ):
+        yield {
+            "path": path,
+            "size_bytes": size,
+            "mtime": mtime.to_pydatetime() if hasattr(mtime, "to_pydatetime") else mtime,
+            "type": element_type,
+            "hash": file_hash or None,
+        }
+
+
+def iter_snapshot_rows(snapshot_path: str):
+    """Snapshot binaire (snapshot.py) : mêmes lignes que iter_csv_rows, dans l'ordre du CSV d'origine."""
+    from snapshot import Snapshot
+
+    with Snapshot(snapshot_path) as snap:
+        for path, element_type, size, mtime, file_hash in snap.iter_records(csv_order=True):
+            yield {
+                "path": path,
+                "size_bytes": float(size) if size is not None else None,
+                "mtime": EPOCH + timedelta(seconds=mtime) if mtime is not None else None,
+                "type": element_type,
+                "hash": file_hash,
+            }
+
+
+def iter_audit_rows(csv_path: str, engine: str = "auto"):
+    """
+    Choisit le moteur de lecture : snapshot binaire (.nasnap) reconnu à son en-tête,
+    sinon pandas seulement pour les gros CSV (ou sur demande).
+
+    Les trois moteurs lisent un hash vide ou manquant comme None : le fichier n'entre dans
+    aucun groupe de doublons. Changement de comportement : l'ancienne lecture pandas le
+    convertissait en chaîne (« nan » / « <na> »), si bien que tous les fichiers sans hash
+    étaient marqués doublons les uns des autres dans le HTML.
+    Les dates avec fuseau (ISO 8601) sont ramenées en UTC sans fuseau, comme celles du scanner.
+    """
+    from snapshot import is_snapshot
+
+    if is_snapshot(csv_path):
+        return iter_snapshot_rows(csv_path)
+    if engine == "auto":
+        engine = "python"
+        if os.path.getsize(csv_path) >= PANDAS_ENGINE_MIN_BYTES:
+            try:
+                import pandas  # noqa: F401
+                engine = "pandas"
+            except ImportError:
+                pass
+    return iter_pandas_rows(csv_path) if engine == "pandas" else iter_csv_rows(csv_path)
+
+
+def build_aggregates(rows):
     counts = defaultdict(int)
     parents = {}
     labels = {}
@@ -39,29 +183,29 @@ def build_aggregates(df: pd.DataFrame):
     types = {}
     path_to_hash = {}
 
-    for _, row in df.iterrows():
+    for row in rows:
         path = row["path"]
         parts = split_parts(path)
         if not parts:
             continue
 
-        size = row.get("size_bytes", float("nan"))
-        mtime = row.get("mtime", pd.NaT)
-        element_type = row.get("type", "N/A")
-        file_hash = row.get("hash") if "hash" in df.columns else None
+        size = row.get("size_bytes")
+        mtime = row.get("mtime")
+        element_type = row.get("type") or "N/A"
+        file_hash = row.get("hash")
 
         for i in range(1, len(parts) + 1):
             node = "/".join(parts[:i])
             parent = "/".join(parts[:i - 1]) if i > 1 else ""
             counts[node] += 1
-            sizes[node] += 0 if pd.isna(size) else float(size)
+            sizes[node] += 0 if size is None else float(size)
             parents[node] = parent
             labels[node] = parts[i - 1]
 
             if i == len(parts):
                 types[node] = element_type
-                if file_hash and isinstance(file_hash, str) and file_hash.strip():
-                    path_to_hash[node] = file_hash.strip().lower()
+                if file_hash:
+                    path_to_hash[node] = file_hash
             else:
                 types[node] = "directory"
             # if i == len(parts):
@@ -71,14 +215,23 @@ def build_aggregates(df: pd.DataFrame):
             # else:
             #     types[node] = "directory"
 
-            if not pd.isna(mtime):
+            if mtime is not None:
                 prev_date = dates.get(node)
-                if pd.isna(prev_date) or (mtime > prev_date):
+                if prev_date is None or (mtime > prev_date):
                     dates[node] = mtime
 
     return counts, parents, labels, sizes, dates, types, path_to_hash
 
 
+def find_archived_paths(path_to_hash: dict, catalog_path: str):
+    """Chemins absolus dont le hash figure dans un catalogue de référence (voir hash_catalog.py)."""
+    from hash_catalog import HashCatalog  # numpy requis uniquement pour cette option
+
+    paths = list(path_to_hash)
+    found = HashCatalog(catalog_path).contains([path_to_hash[p] for p in paths])
+    return {"/" + p for p, hit in zip(paths, found) if hit}
+
+
 def compute_duplicates(path_to_hash: dict):
     hash_to_paths = defaultdict(list)
     for path, sha in path_to_hash.items():
@@ -97,16 +250,129 @@ def compute_duplicates(path_to_hash: dict):
     return duplicate_paths, path_to_other_duplicates
 
 
+def _make_bucket(flat_nodes, children_index, node_sizes, bucket_id, parent_id, label, member_ids):
+    total = sum(node_sizes.get(m, 0.0) for m in member_ids)
+    flat_nodes[bucket_id] = {
+        "name": f"{len(member_ids)} {label} ({format_size(total)})",
+        "id": bucket_id,
+        "type": "bucket",
+        "parent": parent_id,
+        "sizeStr": format_size(total),
+        "dateStr": "N/A",
+        "count": sum(flat_nodes[m]["count"] for m in member_ids),
+        "isDuplicate": False,
+        "duplicateOthers": [],
+        "isArchived": False,
+        "itemStyle": {"color": "rgba(160,160,160,0.78)"}
+    }
+    node_sizes[bucket_id] = total
+    children_index[bucket_id] = sorted(member_ids)
+    return bucket_id
+
+
+def _bucket_by_name_range(flat_nodes, children_index, node_sizes, parent_id, base_id, member_ids,
+                          max_children, max_buckets):
+    """
+    Découpe une liste trop large en plages de noms (a… – f…), récursivement,
+    jusqu'à ce que chaque plage contienne au plus max_children éléments.
+    """
+    by_name = sorted(member_ids, key=lambda m: (flat_nodes[m]["name"].lower(), m))
+    if len(by_name) <= max_children * max_buckets:
+        step = max_children
+    else:
+        step = -(-len(by_name) // max_buckets)
+    buckets = []
+    for i in range(0, len(by_name), step):
+        chunk = by_name[i:i + step]
+        first = flat_nodes[chunk[0]]["name"]
+        last = flat_nodes[chunk[-1]]["name"]
+        bucket_id = _make_bucket(
+            flat_nodes, children_index, node_sizes,
+            f"{base_id}|{i // step}", parent_id,
+            f"éléments {first[:12]}… – {last[:12]}…", chunk
+        )
+        if len(chunk) > max_children:
+            children_index[bucket_id] = _bucket_by_name_range(
+                flat_nodes, children_index, node_sizes, bucket_id, bucket_id, chunk,
+                max_children, max_buckets
+            )
+        buckets.append(bucket_id)
+    return buckets
+
+
+def _bucket_wide_directory(flat_nodes, children_index, node_sizes, parent_id,
+                           max_children, max_buckets):
+    """
+    Garde les max_children enfants les plus lourds de parent_id et regroupe le reste
+    en nœuds « N autres fichiers .ext (X MB) » (un seau par extension, un pour les dossiers).
+    """
+    ranked = sorted(children_index[parent_id], key=lambda c: (-node_sizes.get(c, 0.0), c))
+    kept, rest = ranked[:max_children], ranked[max_children:]
+
+    groups = defaultdict(list)
+    for cid in rest:
+        node = flat_nodes[cid]
+        if node["type"] == "directory":
+            groups["autres dossiers"].append(cid)
+        elif "." in node["name"][1:]:
+            groups["autres fichiers ." + node["name"].rsplit(".", 1)[1].lower()].append(cid)
+        else:
+            groups["autres fichiers sans extension"].append(cid)
+
+    ordered = sorted(groups.items(), key=lambda kv: -sum(node_sizes.get(c, 0.0) for c in kv[1]))
+    if len(ordered) > max_buckets:
+        merged = [cid for _, members in ordered[max_buckets - 1:] for cid in members]
+        ordered = ordered[:max_buckets - 1] + [("autres éléments", merged)]
+
+    base_id = LOD_PREFIX + parent_id
+    if len(ordered) == 1:
+        # Un seul groupe : découper directement par plages de noms
+        buckets = _bucket_by_name_range(
+            flat_nodes, children_index, node_sizes, parent_id, base_id, ordered[0][1],
+            max_children, max_buckets
+        )
+    else:
+        buckets = []
+        for label, members in ordered:
+            bucket_id = _make_bucket(
+                flat_nodes, children_index, node_sizes,
+                f"{base_id}|{label}", parent_id, label, members
+            )
+            if len(members) > max_children:
+                children_index[bucket_id] = _bucket_by_name_range(
+                    flat_nodes, children_index, node_sizes, bucket_id, bucket_id, members,
+                    max_children, max_buckets
+                )
+            buckets.append(bucket_id)
+
+    children_index[parent_id] = sorted(kept) + buckets
+
+
+def apply_level_of_detail(flat_nodes, children_index, node_sizes,
+                          max_children=LOD_MAX_CHILDREN, max_buckets=LOD_MAX_BUCKETS):
+    """
+    Borne le nombre d'enfants affichés par nœud : chaque dossier de plus de
+    max_children enfants est réduit à ses max_children plus gros enfants et à au
+    plus max_buckets nœuds de regroupement (type 'bucket'), eux-mêmes explorables.
+    """
+    for parent_id in [pid for pid, cids in children_index.items() if len(cids) > max_children]:
+        _bucket_wide_directory(flat_nodes, children_index, node_sizes, parent_id,
+                               max_children, max_buckets)
+
+
 def build_flat_indexes(counts, parents, labels, sizes, dates, types,
-                       duplicate_paths, path_to_other_duplicates):
+                       duplicate_paths, path_to_other_duplicates,
+                       max_children=LOD_MAX_CHILDREN, archived_paths=None):
     """
     Construit :
-      - flat_nodes: { id -> {name, id, type, sizeStr, dateStr, count, isDuplicate, duplicateOthers, itemStyle} }
+      - flat_nodes: { id -> {name, id, type, sizeStr, dateStr, count, isDuplicate, duplicateOthers, isArchived, itemStyle} }
       - children_index: { parent_id -> [child_id, ...] }
     Sans arborescence imbriquée : le chargement (et la profondeur visible) se fera côté JS.
+    Les dossiers très larges sont regroupés (voir apply_level_of_detail).
     """
     flat_nodes = {}
     children_index = defaultdict(list)
+    node_sizes = {"/": float(sizes.get("", 0.0))}
 
     # Racine
     flat_nodes["/"] = {
@@ -114,10 +380,11 @@ def build_flat_indexes(counts, parents, labels, sizes, dates, types,
         "id": "/",
         "type": "directory",
         "sizeStr": format_size(sizes.get("", 0.0)),
-        "dateStr": format_date(dates.get("", pd.NaT)),
+        "dateStr": format_date(dates.get("")),
         "count": int(counts.get("", 0)),
         "isDuplicate": False,
         "duplicateOthers": [],
+        "isArchived": False,
         "itemStyle": {}
     }
 
@@ -127,6 +394,7 @@ def build_flat_indexes(counts, parents, labels, sizes, dates, types,
         is_file = (types.get(node_id, "").lower() == "file")
         is_dup = is_file and (abs_path in duplicate_paths)
         other_dups = path_to_other_duplicates.get(abs_path, []) if is_dup else []
+        is_archived = is_file and archived_paths is not None and abs_path in archived_paths
 
         if is_dup:
             color = "rgba(220,20,60,0.9)"  # Rouge pour les fichiers doublons
@@ -141,14 +409,16 @@ def build_flat_indexes(counts, parents, labels, sizes, dates, types,
             "id": abs_path,
             "type": types.get(node_id, "N/A"),
             "sizeStr": format_size(sizes.get(node_id, 0.0)),
-            "dateStr": format_date(dates.get(node_id, pd.NaT)),
+            "dateStr": format_date(dates.get(node_id)),
             "count": int(counts.get(node_id, 0)),
             "isDuplicate": is_dup,
             "duplicateOthers": other_dups,
+            "isArchived": is_archived,
             "itemStyle": {"color": color}
         }
 
         children_index[parent_id].append(abs_path)
+        node_sizes[abs_path] = float(sizes.get(node_id, 0.0))
     
     def mark_duplicate_dirs(flat_nodes, children_index):
         def recurse(node_id):
@@ -175,10 +445,171 @@ def build_flat_indexes(counts, parents, labels, sizes, dates, types,
     for pid in children_index:
         children_index[pid].sort()
 
+    if max_children:
+        apply_level_of_detail(flat_nodes, children_index, node_sizes, max_children)
+
     return flat_nodes, children_index
 
 
-def write_html_echarts(flat_nodes: dict, children_index: dict, output_html: str, title: str):
+def search_key(text: str) -> str:
+    # Même normalisation que côté JS : NFC + minuscules
+    return unicodedata.normalize("NFC", text).lower()
+
+
+def _base36(value: int) -> str:
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    if value == 0:
+        return "0"
+    out = []
+    while value:
+        value, rem = divmod(value, 36)
+        out.append(digits[rem])
+    return "".join(reversed(out))
+
+
+def _encode_postings(indexes) -> str:
+    # Liste croissante d'indices -> écarts successifs en base 36 séparés par des virgules
+    parts = []
+    prev = 0
+    for i in indexes:
+        parts.append(_base36(i - prev))
+        prev = i
+    return ",".join(parts)
+
+
+def build_search_index(flat_nodes: dict):
+    """
+    Construit l'index de recherche de la sidebar :
+      - nodes: position dans flat_nodes (ordre des clés de flatNodes côté JS) de chaque nœud,
+        par rang (count décroissant puis chemin) : les chemins ne sont pas répétés ;
+      - names: noms normalisés (NFC + minuscules), alignés sur nodes ;
+      - trigrams: { trigramme -> postings } sur les noms ;
+      - ext: { extension -> postings } pour les fichiers ;
+      - pathOrder: rangs triés par chemin normalisé (recherche par préfixe).
+    Les postings sont des rangs croissants : les 200 premiers résultats vérifiés
+    sont donc directement les 200 meilleurs. Clés triées : sortie identique d'une exécution
+    à l'autre (l'ordre d'un set varie avec PYTHONHASHSEED).
+    """
+    node_index = {nid: i for i, nid in enumerate(flat_nodes)}
+    ids = [nid for nid, node in flat_nodes.items() if nid != "/" and node["type"] != "bucket"]
+    ids.sort(key=lambda nid: (-flat_nodes[nid]["count"], nid))
+
+    names = []
+    trigrams = defaultdict(lambda: array("I"))
+    exts = defaultdict(lambda: array("I"))
+    for rank, nid in enumerate(ids):
+        node = flat_nodes[nid]
+        name = search_key(node["name"] or "")
+        names.append(name)
+        for tri in sorted({name[i:i + 3] for i in range(len(name) - 2)}):
+            trigrams[tri].append(rank)
+        if node["type"] != "directory" and "." in name[1:]:
+            exts[name.rsplit(".", 1)[1]].append(rank)
+
+    # Ordre des chemins en unités UTF-16 pour coller à la comparaison des chaînes JS
+    path_order = sorted(
+        range(len(ids)),
+        key=lambda rank: search_key(ids[rank]).encode("utf-16-be"),
+    )
+
+    return {
+        "nodes": [node_index[nid] for nid in ids],
+        "names": names,
+        "trigrams": {tri: _encode_postings(trigrams[tri]) for tri in sorted(trigrams)},
+        "ext": {ext: _encode_postings(exts[ext]) for ext in sorted(exts)},
+        "pathOrder": path_order,
+    }
+
+
+class _BrotliWriter:
+    """
+    Écriture texte incrémentale vers un fichier compressé en brotli. Les petites écritures
+    (« , », « { »…) sont regroupées : le compresseur ne reçoit que des tampons de FLUSH_CHARS.
+    """
+
+    FLUSH_CHARS = 64 * 1024
+
+    def __init__(self, path: str):
+        try:
+            import brotli
+        except ImportError as e:
+            raise RuntimeError("Compression brotli indisponible : installez le paquet 'brotli'.") from e
+        self._raw = open(path, "wb")
+        self._compressor = brotli.Compressor(mode=brotli.MODE_TEXT)
+        self._pending = []
+        self._pending_len = 0
+
+    def write(self, text: str):
+        self._pending.append(text)
+        self._pending_len += len(text)
+        if self._pending_len >= self.FLUSH_CHARS:
+            self._flush_pending()
+
+    def _flush_pending(self):
+        if self._pending:
+            self._raw.write(self._compressor.process("".join(self._pending).encode("utf-8")))
+            self._pending.clear()
+            self._pending_len = 0
+
+    def close(self):
+        self._flush_pending()
+        self._raw.write(self._compressor.finish())
+        self._raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+COMPRESS_SUFFIXES = {"gzip": ".gz", "brotli": ".br"}
+
+
+def open_html_output(output_html: str, compress: str = "none"):
+    """Ouvre la sortie HTML (texte UTF-8), éventuellement compressée ; renvoie (fichier, chemin)."""
+    suffix = COMPRESS_SUFFIXES.get(compress, "")
+    if suffix and not output_html.endswith(suffix):
+        output_html += suffix
+    if compress == "gzip":
+        return gzip.open(output_html, "wt", encoding="utf-8", compresslevel=6), output_html
+    if compress == "brotli":
+        return _BrotliWriter(output_html), output_html
+    return open(output_html, "w", encoding="utf-8", buffering=1 << 20), output_html
+
+
+def _dump(value) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def stream_json(f, value, depth: int):
+    """
+    Écrit value en JSON dans f sans construire la chaîne complète :
+    les dict/list sont parcourus sur `depth` niveaux, le reste est sérialisé élément par élément.
+    """
+    if depth <= 0 or not isinstance(value, (dict, list)):
+        f.write(_dump(value))
+        return
+    if isinstance(value, dict):
+        f.write("{")
+        for i, (key, item) in enumerate(value.items()):
+            if i:
+                f.write(",")
+            f.write(_dump(key))
+            f.write(":")
+            stream_json(f, item, depth - 1)
+        f.write("}")
+    else:
+        f.write("[")
+        for i, item in enumerate(value):
+            if i:
+                f.write(",")
+            stream_json(f, item, depth - 1)
+        f.write("]")
+
+
+def write_html_echarts(flat_nodes: dict, children_index: dict, search_index: dict,
+                       output_html: str, title: str, compress: str = "none"):
     """
     Génère une page HTML avec :
       - ECharts 'tree' (roam: true) ;
@@ -186,6 +617,8 @@ def write_html_echarts(flat_nodes: dict, children_index: dict, output_html: str,
       - Chargement paresseux (lazy) ;
       - Sélection de fichiers/dossiers (Ctrl+clic) ;
       - Export JSON de la liste des chemins sélectionnés.
+    Le gabarit et les données sont écrits en flux (nœud par nœud) : aucune copie
+    complète de la page n'est construite en mémoire. Renvoie le chemin écrit.
     """
     html_template = r"""
 <!DOCTYPE html>
@@ -265,6 +698,7 @@ def write_html_echarts(flat_nodes: dict, children_index: dict, output_html: str,
       margin-left: 6px;
     }
     .dup { color: #DC143C; font-weight: 600; }
+    .arch { color: #2E8B57; font-weight: 600; }
     .sep { opacity: .65; }
     .smallhint {
       font-size: 11px;
@@ -323,6 +757,7 @@ def write_html_echarts(flat_nodes: dict, children_index: dict, output_html: str,
         <div style="font-weight:600; margin-bottom:8px;">Navigation</div>
         <input id="search" type="text" placeholder="Rechercher un dossier/fichier…" />
         <div class="smallhint">
+          Recherche : nom, <code>*.jpg</code> ou <code>ext:jpg</code>, <code>/chemin/début</code> <br/> <br/>
           Clic = naviguer dans l'arbre <br/> <br/>
           ⌘+clic (ou Alt+clic) = (dé)sélectionner pour suppression potentielle.
         </div>
@@ -349,6 +784,10 @@ def write_html_echarts(flat_nodes: dict, children_index: dict, output_html: str,
     // ====== Données plates (lazy) ======
     const flatNodes = %%FLAT_NODES%%;       // { id: {name, id, type, sizeStr, dateStr, count, ...} }
     const childrenIndex = %%CHILD_INDEX%%;  // { parent_id: [child_id, ...] }
+    const searchIndex = %%SEARCH_INDEX%%;   // { nodes, names, trigrams, ext, pathOrder }
+    // Chemins par rang : références aux clés de flatNodes (ids jamais numériques : ordre d'insertion)
+    const NODE_IDS = Object.keys(flatNodes);
+    const searchIds = searchIndex.nodes.map(i => NODE_IDS[i]);
 
     // Racine
     const ROOT_ID = '/';
@@ -380,6 +819,10 @@ def write_html_echarts(flat_nodes: dict, children_index: dict, output_html: str,
         // on évite toute "sélection" de la racine par sécurité
         return;
       }
+      if (flatNodes[id]?.type === 'bucket') {
+        // un regroupement n'est pas un chemin réel
+        return;
+      }
       if (selectedPaths.has(id)) {
         selectedPaths.delete(id);
       } else {
@@ -412,11 +855,13 @@ def write_html_echarts(flat_nodes: dict, children_index: dict, output_html: str,
         name: n.name,
         id: n.id,
         type: n.type,
+        parent: n.parent,
         sizeStr: n.sizeStr,
         dateStr: n.dateStr,
         count: n.count,
         isDuplicate: !!n.isDuplicate,
         duplicateOthers: Array.isArray(n.duplicateOthers) ? n.duplicateOthers.slice() : [],
+        isArchived: !!n.isArchived,
         itemStyle: n.itemStyle || {}
       };
     }
@@ -508,17 +953,18 @@ def write_html_echarts(flat_nodes: dict, children_index: dict, output_html: str,
           const d = info.data || {};
           const typeStr = (d.type === 'directory')
             ? 'Dossier'
-            : (d.type === 'file' ? 'Fichier' : 'N/A');
+            : (d.type === 'file' ? 'Fichier' : (d.type === 'bucket' ? 'Regroupement' : 'N/A'));
           const dup = (d.isDuplicate && Array.isArray(d.duplicateOthers) && d.duplicateOthers.length)
             ? ('<br><b style="color:#DC143C">Doublons détectés</b><br>' + d.duplicateOthers.join('<br>'))
             : '';
+          const archived = d.isArchived ? '<br><b style="color:#2E8B57">Déjà archivé</b>' : '';
           const hint = '<br><span style="font-size:11px;color:#666;">⌘+clic (ou Alt+clic) sur le nœud pour l’ajouter/retirer de la sélection.</span>';
           return (
-            '<b>Chemin absolu :</b> ' + (d.id || '/') + '<br>' +
+            '<b>Chemin absolu :</b> ' + ((d.type === 'bucket' ? d.parent : d.id) || '/') + '<br>' +
             '<b>Type :</b> ' + typeStr + '<br>' +
             "<b>Nombre d\\'éléments :</b> " + (d.count || 0) + '<br>' +
             '<b>Taille totale :</b> ' + (d.sizeStr || '') + '<br>' +
-            '<b>Dernière modification :</b> ' + (d.dateStr || '') + dup + hint
+            '<b>Dernière modification :</b> ' + (d.dateStr || '') + dup + archived + hint
           );
         }
       },
@@ -540,6 +986,9 @@ def write_html_echarts(flat_nodes: dict, children_index: dict, output_html: str,
     });
 
     function getAncestorPaths(id) {
+      // Regroupement : fil d'Ariane du dossier parent, puis le regroupement lui-même
+      const n = flatNodes[id];
+      if (n && n.type === 'bucket') return getAncestorPaths(n.parent).concat([id]);
       const chain = ['/'];
       if (id === '/' || !id) return chain;
       const parts = id.split('/').filter(Boolean);
@@ -634,6 +1083,7 @@ def write_html_echarts(flat_nodes: dict, children_index: dict, output_html: str,
           <span class="label">${n.name}</span>
           <span class="badge">${n.count || 0}</span>
           ${n.isDuplicate ? '<span class="badge dup">dup</span>' : ''}
+          ${n.isArchived ? '<span class="badge arch">archivé</span>' : ''}
         `;
 
         li.onclick = (e) => {
@@ -667,19 +1117,98 @@ def write_html_echarts(flat_nodes: dict, children_index: dict, output_html: str,
       sideTree.appendChild(buildSidebarList(ROOT_ID, 0));
     }
 
+    // ====== Recherche indexée ======
+    const SEARCH_LIMIT = 200;
+
+    function normalizeQuery(s) {
+      return s.normalize('NFC').toLowerCase();
+    }
+
+    // Postings : écarts en base 36 séparés par des virgules ; visit(rang) === false arrête la lecture
+    function decodePostings(encoded, visit) {
+      let acc = 0, start = 0;
+      const len = encoded.length;
+      for (let i = 0; i <= len; i++) {
+        if (i === len || encoded.charCodeAt(i) === 44) {
+          acc += parseInt(encoded.slice(start, i), 36);
+          if (visit(acc) === false) return;
+          start = i + 1;
+        }
+      }
+    }
+
+    function searchByExtension(ext) {
+      const out = [];
+      const encoded = searchIndex.ext[ext];
+      if (encoded) decodePostings(encoded, rank => { out.push(rank); return out.length < SEARCH_LIMIT; });
+      return out;
+    }
+
+    function searchByPathPrefix(q) {
+      const ids = searchIds;
+      const order = searchIndex.pathOrder;
+      const keyAt = pos => normalizeQuery(ids[order[pos]]);
+
+      let lo = 0, hi = order.length;
+      while (lo < hi) {
+        const mid = (lo + hi) >> 1;
+        if (keyAt(mid) < q) lo = mid + 1; else hi = mid;
+      }
+      let end = lo;
+      while (end < order.length && keyAt(end).startsWith(q)) end++;
+
+      const out = [];
+      if ((end - lo) * 50 > ids.length) {
+        // Préfixe très large : parcourir dans l'ordre des rangs s'arrête vite
+        for (let rank = 0; rank < ids.length && out.length < SEARCH_LIMIT; rank++) {
+          if (normalizeQuery(ids[rank]).startsWith(q)) out.push(rank);
+        }
+        return out;
+      }
+      const ranks = Int32Array.from(order.slice(lo, end)).sort();
+      return Array.from(ranks.subarray(0, SEARCH_LIMIT));
+    }
+
+    function searchByName(q) {
+      const names = searchIndex.names;
+      const out = [];
+      if (q.length < 3) {
+        for (let rank = 0; rank < names.length && out.length < SEARCH_LIMIT; rank++) {
+          if (names[rank].includes(q)) out.push(rank);
+        }
+        return out;
+      }
+      // Le trigramme le plus rare donne les candidats, vérifiés ensuite sur le nom complet
+      let rarest = null;
+      for (let i = 0; i + 3 <= q.length; i++) {
+        const encoded = searchIndex.trigrams[q.slice(i, i + 3)];
+        if (!encoded) return out;
+        if (rarest === null || encoded.length < rarest.length) rarest = encoded;
+      }
+      decodePostings(rarest, rank => {
+        if (names[rank].includes(q)) out.push(rank);
+        return out.length < SEARCH_LIMIT;
+      });
+      return out;
+    }
+
+    function searchRanks(q) {
+      if (q.startsWith('ext:')) return searchByExtension(q.slice(4).replace(/^\./, ''));
+      if (q.startsWith('*.')) return searchByExtension(q.slice(2));
+      if (q.startsWith('/')) return searchByPathPrefix(q);
+      return searchByName(q);
+    }
+
     function renderSidebarSearchList(q) {
       const sideTree = document.getElementById('side-tree');
       sideTree.innerHTML = '';
       const ul = document.createElement('ul');
-      const matches = [];
-      for (const [id, n] of Object.entries(flatNodes)) {
-        if (!n.name) continue;
-        if (n.name.toLowerCase().includes(q)) matches.push(n);
-      }
-      matches.sort((a,b) => (b.count||0)-(a.count||0));
-      matches.slice(0, 200).forEach(n => {
+      const matches = searchRanks(normalizeQuery(q))
+        .map(rank => flatNodes[searchIds[rank]])
+        .filter(Boolean);
+      matches.forEach(n => {
         const li = document.createElement('li');
-        li.innerHTML = `• <span class="label">${n.name}</span> <span class="badge">${n.count || 0}</span> ${n.isDuplicate ? '<span class="badge dup">dup</span>' : ''}`;
+        li.innerHTML = `• <span class="label">${n.name}</span> <span class="badge">${n.count || 0}</span> ${n.isDuplicate ? '<span class="badge dup">dup</span>' : ''} ${n.isArchived ? '<span class="badge arch">archivé</span>' : ''}`;
         li.onclick = (e) => {
             e.stopPropagation();
             const isSelectClick = e.metaKey || e.ctrlKey || e.altKey;
@@ -716,14 +1245,23 @@ def write_html_echarts(flat_nodes: dict, children_index: dict, output_html: str,
 </body>
 </html>
 """
-    html = (
-        html_template
-        .replace("%%TITLE%%", title)
-        .replace("%%FLAT_NODES%%", json.dumps(flat_nodes, ensure_ascii=False, separators=(",", ":")))
-        .replace("%%CHILD_INDEX%%", json.dumps(children_index, ensure_ascii=False, separators=(",", ":")))
-    )
-    with open(output_html, "w", encoding="utf-8") as f:
-        f.write(html)
+    # Profondeur de parcours : flatNodes/childrenIndex nœud par nœud, index de recherche entrée par entrée
+    payloads = {
+        "FLAT_NODES": (flat_nodes, 1),
+        "CHILD_INDEX": (children_index, 1),
+        "SEARCH_INDEX": (search_index, 2),
+    }
+    parts = re.split(r"%%(FLAT_NODES|CHILD_INDEX|SEARCH_INDEX)%%", html_template.replace("%%TITLE%%", title))
+
+    f, output_path = open_html_output(output_html, compress)
+    with f:
+        for i, part in enumerate(parts):
+            if i % 2:
+                value, depth = payloads[part]
+                stream_json(f, value, depth)
+            else:
+                f.write(part)
+    return output_path
 
 
 def main():
@@ -737,7 +1275,8 @@ def main():
     parser.add_argument(
         "--csv",
         required=True,
-        help="CSV d’entrée: colonnes 'path','size_bytes','mtime' + optionnels 'type','hash'"
+        help="CSV d’entrée: colonnes 'path','size_bytes','mtime' + optionnels 'type','hash' "
+             "(ou snapshot binaire .nasnap produit par snapshot.py)"
     )
     parser.add_argument(
         "--output",
@@ -749,50 +1288,50 @@ def main():
         default="Tree vizu",
         help="Titre de la visualisation"
     )
+    parser.add_argument(
+        "--compress",
+        choices=["none", "gzip", "brotli"],
+        default="none",
+        help="Compression de la sortie HTML (ajoute .gz / .br au nom du fichier)"
+    )
+    parser.add_argument(
+        "--archive-catalog",
+        default=None,
+        help="Catalogue de hashes de référence (hash_catalog.py) pour marquer les fichiers déjà archivés"
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["auto", "python", "pandas"],
+        default="auto",
+        help="Lecture du CSV : python (bibliothèque standard) ou pandas ; auto = pandas pour les gros CSV "
+             "(ignoré pour un snapshot .nasnap)"
+    )
+    parser.add_argument(
+        "--max-children",
+        type=int,
+        default=LOD_MAX_CHILDREN,
+        help="Nombre max d'enfants affichés par dossier avant regroupement (0 = désactivé)"
+    )
     args = parser.parse_args()
 
-    usecols = ["path", "size_bytes", "mtime", "type", "hash"]
-    dtypes = {
-        "path": "string",
-        "size_bytes": "float64",
-        "type": "string",
-        "hash": "string",
-    }
-
-    df = pd.read_csv(
-        args.csv,
-        usecols=[c for c in usecols if c],
-        dtype=dtypes,
-        parse_dates=["mtime"],
-        na_values=["nan", "NaN", ""],
-        keep_default_na=True,
-        low_memory=True,
-        engine="c",
+    counts, parents, labels, sizes, dates, types, path_to_hash = build_aggregates(
+        iter_audit_rows(args.csv, args.engine)
     )
-
-    for col in ["path", "size_bytes", "mtime"]:
-        if col not in df:
-            raise ValueError(f"Le fichier CSV doit contenir la colonne '{col}'.")
-
-    df["path"] = df["path"].astype(str)
-    df["size_bytes"] = pd.to_numeric(df["size_bytes"], errors="coerce")
-    df["mtime"] = pd.to_datetime(df["mtime"], errors="coerce")
-
-    if "hash" in df.columns:
-        df["hash"] = df["hash"].astype(str).str.strip().str.lower()
-    if "type" in df.columns:
-        df["type"] = df["type"].astype(str).str.strip().str.lower()
-
-    counts, parents, labels, sizes, dates, types, path_to_hash = build_aggregates(df)
     duplicate_paths, path_to_other_duplicates = compute_duplicates(path_to_hash)
+    archived_paths = find_archived_paths(path_to_hash, args.archive_catalog) if args.archive_catalog else None
 
     flat_nodes, children_index = build_flat_indexes(
         counts, parents, labels, sizes, dates, types,
-        duplicate_paths, path_to_other_duplicates
+        duplicate_paths, path_to_other_duplicates,
+        max_children=args.max_children, archived_paths=archived_paths
     )
 
-    write_html_echarts(flat_nodes, children_index, args.output, args.title)
-    print(f"Fichier interactif sauvegardé : {args.output}")
+    search_index = build_search_index(flat_nodes)
+
+    output_path = write_html_echarts(
+        flat_nodes, children_index, search_index, args.output, args.title, args.compress
+    )
+    print(f"Fichier interactif sauvegardé : {output_path}")
     print("Ouvre ce fichier dans ton navigateur (Google Chrome de préférence).")
 
 
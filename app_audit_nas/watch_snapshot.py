@@ -0,0 +1,523 @@
+#!/usr/bin/env python3
+"""
+Mode veille : garde un audit (audit_hashes.csv) à jour en continu, sans rescan complet.
+
+- Linux : abonnement inotify sur les racines auditées (création, écriture, suppression, renommage) ;
+- sinon (ou avec --poll) : balayage périodique des mtimes de dossiers, puis rescan des seuls
+  dossiers modifiés (ajouts / suppressions / renommages ; les réécritures en place ne modifient
+  pas le mtime du dossier et ne sont vues qu'avec inotify) ;
+- débordement de la file (IN_Q_OVERFLOW ou trop de chemins en attente) : rescan ciblé des
+  sous-arbres concernés, complété par un balayage des mtimes de dossiers.
+
+Les chemins modifiés sont re-statés puis re-hashés (b3sum, B3FLAGS comme le scan) et reçoivent
+les mêmes xattrs (hash + tampon) qu'à l'étape 2 : le scan complet suivant ne les re-hashe pas. Le
+CSV est réécrit de façon atomique, avec les empreintes des dossiers touchés recalculées comme à
+l'étape 4. Le snapshot binaire voisin (<csv>.nasnap, contrôlé par delete_from_json.py --snapshot)
+est régénéré à chaque réécriture, ou supprimé s'il ne peut pas l'être, pour ne jamais rester périmé.
+"""
+import argparse
+import csv
+import ctypes
+import ctypes.util
+import fnmatch
+import os
+import select
+import shlex
+import stat
+import struct
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from fsio import RealFS, write_hash_stamp
+from snapshot import csv_to_snapshot
+
+# Mêmes exclusions que hashes_scans.sh
+EXCLUDE_DIRS = {
+    "@eaDir", ".Spotlight-V100", ".fseventsd", ".Trashes", ".AppleDouble",
+    ".git", "__pycache__", "node_modules",
+}
+EXCLUDE_GLOBS = [
+    "*.tmp", "*.bak", "*.log", "*.ini", "*.json", "*.xml", "*.yaml", "*.cfg",
+    "*.db", "*.thm", "*.thumb", "*.cache", "*.old", "*.lock",
+    "*.zip", "*.rar", "*.7z", "*.tar", "*.gz", "*.bz2", "*.xz", "*.tgz", "*.iso",
+    ".DS_Store", "Thumbs.db", "desktop.ini",
+    "._*",
+]
+
+CSV_HEADER = ["path", "type", "size_bytes", "mtime", "hash"]
+MTIME_FORMAT = os.environ.get("MTIME_FORMAT", "%Y-%m-%d %H:%M:%S")
+MTIME_TZ = os.environ.get("MTIME_TZ", "UTC")
+
+# linux/inotify.h
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (IN_CLOSE_WRITE | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+              | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def should_exclude_file(path: str) -> bool:
+    name = os.path.basename(path)
+    return any(fnmatch.fnmatchcase(name, g) for g in EXCLUDE_GLOBS)
+
+
+def should_exclude_dir(path: str) -> bool:
+    return os.path.basename(path) in EXCLUDE_DIRS
+
+
+def fmt_mtime(ts: float) -> str:
+    if MTIME_TZ == "UTC":
+        return datetime.fromtimestamp(int(ts), tz=timezone.utc).strftime(MTIME_FORMAT)
+    return datetime.fromtimestamp(int(ts)).strftime(MTIME_FORMAT)
+
+
+def b3sum(path: str | None = None, data: bytes | None = None) -> str:
+    """Hash BLAKE3 via b3sum (mêmes options B3FLAGS que le scan) ; chaîne vide en cas d'échec."""
+    cmd = ["b3sum", *shlex.split(os.environ.get("B3FLAGS", ""))]
+    cmd += ["--", path] if path is not None else []
+    try:
+        out = subprocess.run(cmd, input=data, capture_output=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+    return out.split(b" ", 1)[0].decode("ascii", "replace").strip()
+
+
+class AuditSnapshot:
+    """Contenu du CSV d'audit en mémoire, indexé par dossier parent et par hash."""
+
+    def __init__(self):
+        self.rows = {}                       # path -> [type, size_bytes, mtime, hash]
+        self.by_dir = defaultdict(set)       # dossier -> chemins directs (fichiers et dossiers)
+        self.hash_paths = defaultdict(set)   # hash -> fichiers
+        self.dirty = False
+
+    @classmethod
+    def load(cls, csv_path: str):
+        snap = cls()
+        if os.path.exists(csv_path):
+            with open(csv_path, newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    snap._put(row["path"], row.get("type") or "file", row.get("size_bytes") or "",
+                              row.get("mtime") or "", (row.get("hash") or "").strip().lower())
+        snap.dirty = False
+        return snap
+
+    def save(self, csv_path: str):
+        """Réécrit le CSV au format de hashes_scans.sh (fichiers puis dossiers), de façon atomique."""
+        tmp_path = csv_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            f.write(",".join(CSV_HEADER) + "\n")
+            for kind in ("file", "directory"):
+                for path, (typ, size, mtime, h) in self.rows.items():
+                    if typ != kind:
+                        continue
+                    p_esc = path.replace('"', '""')
+                    f.write(f'"{p_esc}",{typ},{size},"{mtime}",{h}\n')
+        os.replace(tmp_path, csv_path)
+        self.dirty = False
+
+    def _put(self, path, typ, size, mtime, h):
+        old = self.rows.get(path)
+        if old and old[0] == "file" and old[3]:
+            self.hash_paths[old[3]].discard(path)
+            if not self.hash_paths[old[3]]:
+                del self.hash_paths[old[3]]
+        self.rows[path] = [typ, size, mtime, h]
+        self.by_dir[os.path.dirname(path)].add(path)
+        if typ == "file" and h:
+            self.hash_paths[h].add(path)
+        self.dirty = True
+
+    def set_file(self, path, size, mtime, h):
+        self._put(path, "file", str(size), mtime, h)
+
+    def set_dir(self, path, mtime, h=""):
+        self._put(path, "directory", "", mtime, h)
+
+    def remove(self, path):
+        """Retire un chemin et, pour un dossier, tout son sous-arbre."""
+        old = self.rows.pop(path, None)
+        if old is None:
+            return
+        self.by_dir[os.path.dirname(path)].discard(path)
+        if old[0] == "file" and old[3]:
+            self.hash_paths[old[3]].discard(path)
+            if not self.hash_paths[old[3]]:
+                del self.hash_paths[old[3]]
+        for child in list(self.by_dir.pop(path, ())):
+            self.remove(child)
+        self.dirty = True
+
+    def stamp(self, path):
+        row = self.rows.get(path)
+        return (row[1], row[2]) if row and row[3] else None
+
+    def refresh_dir_fingerprint(self, d):
+        """Empreinte de dossier comme l'étape 4 : b3sum des hashes triés des fichiers directs."""
+        row = self.rows.get(d)
+        if row is None or row[0] != "directory":
+            return
+        hashes = sorted(self.rows[p][3] for p in self.by_dir.get(d, ())
+                        if self.rows[p][0] == "file" and self.rows[p][3])
+        new_hash = b3sum(data="".join(h + "\n" for h in hashes).encode()) if hashes else ""
+        if new_hash != row[3]:
+            row[3] = new_hash
+            self.dirty = True
+
+    def duplicate_groups(self):
+        return sum(1 for paths in self.hash_paths.values() if len(paths) > 1)
+
+
+class InotifyWatcher:
+    """Surveillance récursive inotify (ctypes, sans dépendance externe)."""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        self.wd_to_dir = {}
+        self.dir_to_wd = {}
+
+    def watch_dir(self, d: str) -> bool:
+        wd = self._add_watch(self.fd, os.fsencode(d), WATCH_MASK)
+        if wd < 0:
+            return False  # ex. max_user_watches atteint : le balayage périodique prend le relais
+        self.wd_to_dir[wd] = d
+        self.dir_to_wd[d] = wd
+        return True
+
+    def forget_tree(self, d: str):
+        prefix = d.rstrip("/") + "/"
+        for path in [p for p in self.dir_to_wd if p == d or p.startswith(prefix)]:
+            wd = self.dir_to_wd.pop(path)
+            self.wd_to_dir.pop(wd, None)
+            # Libère la watch (sinon fuite jusqu'à max_user_watches) ; EINVAL si le noyau
+            # l'a déjà retirée (dossier supprimé), sans conséquence
+            self._rm_watch(self.fd, wd)
+
+    def read_events(self, timeout: float):
+        """Renvoie [(chemin, masque)] ; (None, IN_Q_OVERFLOW) si le noyau a perdu des événements."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            buf = os.read(self.fd, 1 << 20)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(buf):
+            wd, mask, _cookie, length = EVENT_HEADER.unpack_from(buf, offset)
+            offset += EVENT_HEADER.size
+            name = buf[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                events.append((None, IN_Q_OVERFLOW))
+                continue
+            d = self.wd_to_dir.get(wd)
+            if d is None:
+                continue
+            if mask & IN_IGNORED:
+                self.wd_to_dir.pop(wd, None)
+                self.dir_to_wd.pop(d, None)
+                continue
+            events.append((os.path.join(d, os.fsdecode(name)) if name else d, mask))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class ChangeFeed:
+    """File des chemins à re-stater / re-hasher et application des changements au snapshot."""
+
+    def __init__(self, snapshot: AuditSnapshot, roots, watcher: InotifyWatcher | None, max_pending: int,
+                 fs=None, hasher=b3sum):
+        self.snapshot = snapshot
+        self.fs = fs if fs is not None else RealFS()   # couche d'accès (fsio.py)
+        self.hasher = hasher
+        self.roots = [r.rstrip("/") or "/" for r in roots]
+        self.watcher = watcher
+        self.max_pending = max_pending
+        self.dir_mtimes = {}                 # dossier -> st_mtime_ns vu au dernier passage
+        self.pending_files = set()
+        self.pending_dirs = {}               # dossier -> rescan récursif ?
+        self.recent_dirs = set()             # dossiers actifs depuis le dernier flush
+        self.touched_dirs = set()            # empreintes de dossiers à recalculer
+        self.hashed = 0
+
+    # --- Enregistrement des dossiers -------------------------------------------------
+    def register_dir(self, d: str):
+        """Ajoute la watch et le mtime du dossier ; renvoie son stat (None si inaccessible)."""
+        try:
+            st = self.fs.stat(d)
+        except OSError:
+            return None
+        self.dir_mtimes[d] = st.st_mtime_ns
+        if self.watcher and d not in self.watcher.dir_to_wd:
+            self.watcher.watch_dir(d)
+        return st
+
+    def register_roots(self):
+        """
+        Premier passage : enregistre tous les dossiers ; ceux absents du snapshot ou dont le
+        mtime diffère de celui du CSV sont mis en file (rattrapage depuis le dernier audit).
+        """
+        for root in self.roots:
+            if not self.fs.isdir(root):
+                print(f"[WATCH] Racine introuvable (ignorée) : {root}", file=sys.stderr)
+                continue
+            for d, subdirs, _files in self.fs.walk(root):
+                subdirs[:] = [s for s in subdirs if s not in EXCLUDE_DIRS]
+                st = self.register_dir(d)
+                row = self.snapshot.rows.get(d)
+                if st is not None and (row is None or row[2] != fmt_mtime(st.st_mtime)):
+                    self.pending_dirs[d] = False
+
+    def forget_tree(self, d: str):
+        prefix = d.rstrip("/") + "/"
+        for path in [p for p in self.dir_mtimes if p == d or p.startswith(prefix)]:
+            del self.dir_mtimes[path]
+        if self.watcher:
+            self.watcher.forget_tree(d)
+        self.snapshot.remove(d)
+        self.touched_dirs.add(os.path.dirname(d))
+
+    # --- Alimentation de la file ------------------------------------------------------
+    def on_event(self, path: str, mask: int):
+        if mask & IN_Q_OVERFLOW:
+            self.on_overflow()
+            return
+        self.recent_dirs.add(os.path.dirname(path))
+        if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+            self.pending_dirs[path] = True
+        elif mask & IN_ISDIR:
+            if should_exclude_dir(path):
+                return
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                self.pending_dirs[path] = True
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self.forget_tree(path)
+        else:
+            self.pending_files.add(path)
+        if len(self.pending_files) > self.max_pending:
+            self.collapse_pending()
+
+    def collapse_pending(self):
+        """File trop longue : on remplace les fichiers par un rescan de leurs dossiers."""
+        for path in self.pending_files:
+            self.pending_dirs.setdefault(os.path.dirname(path), False)
+        self.pending_files.clear()
+
+    def on_overflow(self):
+        """Événements perdus : rescan des sous-arbres actifs récemment + balayage des mtimes."""
+        print("[WATCH] Débordement de la file d'événements : rescan ciblé.", file=sys.stderr)
+        self.collapse_pending()
+        for d in self.recent_dirs:
+            self.pending_dirs[d] = True
+        self.sweep()
+
+    def sweep(self):
+        """Compare le mtime de chaque dossier connu ; les dossiers modifiés sont rescannés."""
+        for d, old in list(self.dir_mtimes.items()):
+            if d not in self.dir_mtimes:
+                continue  # retiré pendant le balayage
+            try:
+                mtime = self.fs.stat(d).st_mtime_ns
+            except FileNotFoundError:
+                self.forget_tree(d)
+                continue
+            except OSError:
+                continue
+            if mtime != old:
+                self.dir_mtimes[d] = mtime
+                self.pending_dirs.setdefault(d, False)
+
+    # --- Application ------------------------------------------------------------------
+    def rescan_dir(self, d: str, recursive: bool):
+        """Relit un dossier (et ses sous-dossiers si recursive) ; les fichiers vont dans la file."""
+        if not self.fs.lexists(d):
+            self.forget_tree(d)
+            return
+        recursive = recursive or d not in self.dir_mtimes
+        st = self.register_dir(d)
+        if st is None:
+            return
+        if d not in self.snapshot.rows:
+            self.touched_dirs.add(d)
+        self.update_dir_row(d, st)
+
+        seen = set()
+        try:
+            with self.fs.scandir(d) as it:
+                for entry in it:
+                    seen.add(entry.path)
+                    if entry.is_dir(follow_symlinks=False):
+                        if not should_exclude_dir(entry.path) and (recursive or entry.path not in self.dir_mtimes):
+                            self.rescan_dir(entry.path, recursive=True)
+                    elif entry.is_file(follow_symlinks=False) and not should_exclude_file(entry.path):
+                        self.pending_files.add(entry.path)
+        except OSError:
+            return
+        for path in list(self.snapshot.by_dir.get(d, ())):
+            if path not in seen:
+                if self.snapshot.rows[path][0] == "directory":
+                    self.forget_tree(path)
+                else:
+                    self.snapshot.remove(path)
+                    self.touched_dirs.add(d)
+
+    def update_dir_row(self, d: str, st):
+        mtime = fmt_mtime(st.st_mtime)
+        row = self.snapshot.rows.get(d)
+        if row is None:
+            self.snapshot.set_dir(d, mtime)
+        elif row[2] != mtime:
+            row[2] = mtime
+            self.snapshot.dirty = True
+
+    def refresh_file(self, path: str):
+        if should_exclude_file(path):
+            return
+        try:
+            st = self.fs.lstat(path)
+        except FileNotFoundError:
+            if path in self.snapshot.rows:
+                self.snapshot.remove(path)
+                self.touched_dirs.add(os.path.dirname(path))
+            return
+        except OSError:
+            return
+        if not stat.S_ISREG(st.st_mode):
+            return
+        size, mtime = str(st.st_size), fmt_mtime(st.st_mtime)
+        if self.snapshot.stamp(path) == (size, mtime):
+            return
+        h = self.hasher(path)
+        self.hashed += 1
+        if h:
+            write_hash_stamp(self.fs, path, h, st)
+        self.snapshot.set_file(path, size, mtime, h)
+        self.touched_dirs.add(os.path.dirname(path))
+
+    def drain(self):
+        """Traite la file : rescans de dossiers, puis re-stat / re-hash des fichiers."""
+        while self.pending_dirs:
+            d, recursive = self.pending_dirs.popitem()
+            self.rescan_dir(d, recursive)
+        while self.pending_files:
+            self.refresh_file(self.pending_files.pop())
+        for d in self.touched_dirs:
+            st = self.register_dir(d) if d in self.dir_mtimes else None
+            if st is not None:
+                self.update_dir_row(d, st)
+            self.snapshot.refresh_dir_fingerprint(d)
+        self.touched_dirs.clear()
+
+
+def refresh_binary_snapshot(csv_path: str):
+    """Régénère <csv>.nasnap s'il existe (même nom que hashes_scans.sh) ; le supprime en cas d'échec."""
+    nasnap = os.path.splitext(csv_path)[0] + ".nasnap"
+    if not os.path.exists(nasnap):
+        return
+    try:
+        csv_to_snapshot(csv_path, nasnap)
+    except (OSError, ValueError) as e:
+        print(f"[WATCH] Snapshot binaire non régénéré ({e}) : {nasnap} supprimé.", file=sys.stderr)
+        try:
+            os.remove(nasnap)
+        except OSError:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Mode veille : applique en continu les changements des racines auditées au CSV d'audit."
+    )
+    parser.add_argument("--csv", required=True, help="CSV d'audit à maintenir (audit_hashes.csv)")
+    parser.add_argument("roots", nargs="+", help="Racines surveillées")
+    parser.add_argument("--poll", action="store_true", help="Forcer le balayage périodique (sans inotify)")
+    parser.add_argument("--sweep-interval", type=float, default=300.0,
+                        help="Intervalle (s) entre deux balayages des mtimes de dossiers")
+    parser.add_argument("--flush-interval", type=float, default=30.0,
+                        help="Délai (s) minimal entre deux réécritures du CSV")
+    parser.add_argument("--max-pending", type=int, default=100_000,
+                        help="Taille max de la file de fichiers avant repli sur un rescan par dossier")
+    parser.add_argument("--html", default=None,
+                        help="Régénérer aussi la visualisation (three_visu.py) après chaque réécriture")
+    parser.add_argument("--once", action="store_true",
+                        help="Un seul passage (balayage + rescan des changements), puis sortie")
+    args = parser.parse_args()
+
+    snapshot = AuditSnapshot.load(args.csv)
+    watcher = None
+    if not args.poll and sys.platform.startswith("linux"):
+        try:
+            watcher = InotifyWatcher()
+        except OSError as e:
+            print(f"[WATCH] inotify indisponible ({e}) : balayage périodique.", file=sys.stderr)
+
+    feed = ChangeFeed(snapshot, args.roots, watcher, args.max_pending)
+    feed.register_roots()
+    print(f"[WATCH] {len(feed.dir_mtimes)} dossiers suivis ({'inotify' if watcher else 'balayage'}).")
+
+    def flush():
+        feed.drain()
+        if snapshot.dirty:
+            snapshot.save(args.csv)
+            refresh_binary_snapshot(args.csv)
+            print(f"[WATCH] CSV à jour : {len(snapshot.rows)} lignes, {feed.hashed} fichiers re-hashés, "
+                  f"{snapshot.duplicate_groups()} groupes de doublons.")
+            if args.html:
+                here = os.path.dirname(os.path.abspath(__file__))
+                subprocess.run([sys.executable, os.path.join(here, "three_visu.py"),
+                                "--csv", args.csv, "--output", args.html], check=False)
+        feed.recent_dirs.clear()
+
+    last_sweep = last_flush = 0.0
+    try:
+        while True:
+            now = time.monotonic()
+            if now - last_sweep >= args.sweep_interval:
+                feed.sweep()
+                last_sweep = now
+            if watcher:
+                for path, mask in watcher.read_events(timeout=1.0):
+                    feed.on_event(path, mask)
+            if args.once or (now - last_flush >= args.flush_interval):
+                flush()
+                last_flush = now
+                if args.once:
+                    break
+            if not watcher:
+                time.sleep(1.0)
+    except KeyboardInterrupt:
+        flush()
+    finally:
+        if watcher:
+            watcher.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+import json
+import os
+import subprocess
+import sys
+
+SNAPSHOT = os.path.join(os.path.dirname(__file__), "..", "app_audit_nas", "snapshot.py")
+
+ROWS = [
+    ("/Volumes/NAS/a/only.jpg", "10", "2020-01-01 00:00:00", "aa"),
+    ("/Volumes/NAS/a/only.jpg", "10", "2020-01-01 00:00:00", "aa"),
+    ("/Volumes/NAS/Donn\xe9es/seul.jpg", "10", "2020-01-01 00:00:00", "bb"),
+    ("/Volumes/NAS/Donne\u0301es/seul.jpg", "10", "2020-01-01 00:00:00", "bb"),
+    ("/Volumes/NAS/a/x.jpg", "20", "2020-01-01 00:00:00", "cc"),
+    ("/Volumes/NAS/b/x.jpg", "20", "2021-01-01 00:00:00", "cc"),
+]
+
+
+def test_extra_copies_never_lists_the_only_copy(tmp_path):
+    csv_path = tmp_path / "audit_hashes.csv"
+    csv_path.write_text(
+        "path,type,size_bytes,mtime,hash\n"
+        + "".join(f'"{p}",file,{s},"{m}",{h * 32}\n' for p, s, m, h in ROWS),
+        encoding="utf-8",
+    )
+    snap, out = str(tmp_path / "audit_hashes.nasnap"), tmp_path / "paths_to_delete.json"
+    subprocess.run([sys.executable, SNAPSHOT, "from-csv", str(csv_path), snap], check=True, capture_output=True)
+    subprocess.run([sys.executable, SNAPSHOT, "query", snap, "--extra-copies", "--format", "json",
+                    "--output", str(out)], check=True, capture_output=True)
+    assert json.loads(out.read_text(encoding="utf-8")) == ["/Volumes/NAS/b/x.jpg"]
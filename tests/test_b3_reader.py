@@ -0,0 +1,30 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app_audit_nas"))
+
+from b3_reader import is_local_filesystem, parse_proc_mounts  # noqa: E402
+
+MOUNTINFO = (
+    "25 1 8:1 / / rw,relatime - ext4 /dev/sda1 rw\n"
+    "97 25 0:52 / /mnt/Donn\xe9es\\040NAS rw,relatime - cifs //nas/partage rw,vers=3.1.1\n"
+).encode("utf-8")
+MOUNTS = (
+    "/dev/sda1 / ext4 rw,relatime 0 0\n"
+    "//nas/partage /mnt/Donn\xe9es\\040NAS cifs rw,vers=3.1.1 0 0\n"
+).encode("utf-8")
+
+
+def test_accented_mount_point_with_octal_escape():
+    for data in (MOUNTINFO, MOUNTS):
+        assert ("/mnt/Donn\xe9es NAS", "cifs") in parse_proc_mounts(data)
+
+
+def test_share_under_accented_mount_is_not_local():
+    mounts = sorted(parse_proc_mounts(MOUNTINFO), key=lambda m: len(m[0]), reverse=True)
+    assert not is_local_filesystem("/mnt/Donn\xe9es NAS/photos/a.jpg", mounts)
+    assert is_local_filesystem("/home/a.jpg", mounts)
+
+
+def test_unmatched_path_is_not_local():
+    assert not is_local_filesystem("/data/a.jpg", [("/mnt/usb", "ext4")])
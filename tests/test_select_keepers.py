@@ -0,0 +1,51 @@
+import json
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(__file__)
+sys.path.insert(0, os.path.join(HERE, "..", "app_audit_nas"))
+
+from select_keepers import DEFAULT_RULES, load_duplicates, select_deletions  # noqa: E402
+
+HEADER = "path,type,size_bytes,mtime,hash\n"
+
+
+def write_csv(tmp_path, rows):
+    path = tmp_path / "audit_hashes.csv"
+    path.write_text(HEADER + "".join(",".join(r) + "\n" for r in rows), encoding="utf-8")
+    return str(path)
+
+
+def test_same_path_twice_is_not_a_duplicate(tmp_path):
+    # Racines imbriquées (/Volumes/NAS/a et /Volumes/NAS/a/b) : la même ligne apparaît deux fois
+    csv_path = write_csv(tmp_path, [
+        ("/Volumes/NAS/a/only.jpg", "file", "10", "2020-01-01 00:00:00", "aa"),
+        ("/Volumes/NAS/a/only.jpg", "file", "10", "2020-01-01 00:00:00", "aa"),
+        ("/Volumes/NAS/a/x.jpg", "file", "20", "2020-01-01 00:00:00", "bb"),
+        ("/Volumes/NAS/b/x.jpg", "file", "20", "2021-01-01 00:00:00", "bb"),
+    ])
+    df = load_duplicates(csv_path)
+    to_delete = select_deletions(df, DEFAULT_RULES.split(","))
+    assert to_delete["path"].tolist() == ["/Volumes/NAS/b/x.jpg"]
+
+
+def test_nfc_and_nfd_spellings_of_one_path(tmp_path):
+    csv_path = write_csv(tmp_path, [
+        ("/Volumes/NAS/Donn\xe9es/only.jpg", "file", "10", "2020-01-01 00:00:00", "aa"),
+        ("/Volumes/NAS/Donne\u0301es/only.jpg", "file", "10", "2020-01-01 00:00:00", "aa"),
+    ])
+    df = load_duplicates(csv_path)
+    assert select_deletions(df, DEFAULT_RULES.split(",")).empty
+
+
+def test_cli_never_lists_the_only_copy(tmp_path):
+    csv_path = write_csv(tmp_path, [
+        ("/Volumes/NAS/a/only.jpg", "file", "10", "2020-01-01 00:00:00", "aa"),
+        ("/Volumes/NAS/a/only.jpg", "file", "10", "2020-01-01 00:00:00", "aa"),
+    ])
+    out = tmp_path / "paths_to_delete.json"
+    script = os.path.join(HERE, "..", "app_audit_nas", "select_keepers.py")
+    subprocess.run([sys.executable, script, "--csv", csv_path, "--output", str(out)],
+                   check=True, capture_output=True)
+    assert json.loads(out.read_text(encoding="utf-8")) == []